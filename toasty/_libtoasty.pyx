@@ -41,6 +41,63 @@ def mid(a, b):
     return n.x, n.y
 
 
+@cython.boundscheck(False)
+@cython.wraparound(False)
+def div4_corners(const DTYPE_t[:, :] corners, bint increasing):
+    """Compute the corners of the four children of a toast tile
+
+    Parameters
+    ----------
+    corners : array
+        A 4×2 float64 array giving the (lon, lat) of the upper-left,
+        upper-right, lower-right, and lower-left corners of the tile, in
+        radians
+    increasing : bool
+        Whether the two HTM trixels that define this toast tile are joined
+        along the diagonal which increases from left to right
+
+    Returns
+    -------
+    A 4×4×2 array of the corners of the top-left, top-right, bottom-left, and
+    bottom-right children, with the same layout as the input
+    """
+    if corners.shape[0] != 4 or corners.shape[1] != 2:
+        raise ValueError("Toast corners must be a 4x2 array")
+
+    cdef Point ul = Point(corners[0, 0], corners[0, 1])
+    cdef Point ur = Point(corners[1, 0], corners[1, 1])
+    cdef Point lr = Point(corners[2, 0], corners[2, 1])
+    cdef Point ll = Point(corners[3, 0], corners[3, 1])
+    cdef Point to, ri, bo, le, ce
+
+    _mid(ul, ur, &to)
+    _mid(ur, lr, &ri)
+    _mid(lr, ll, &bo)
+    _mid(ll, ul, &le)
+
+    if increasing:
+        _mid(ll, ur, &ce)
+    else:
+        _mid(ul, lr, &ce)
+
+    cdef Point children[4][4]
+    children[0] = [ul, to, ce, le]
+    children[1] = [to, ur, ri, ce]
+    children[2] = [le, ce, bo, ll]
+    children[3] = [ce, ri, lr, bo]
+
+    out = np.empty((4, 4, 2), dtype=DTYPE)
+    cdef DTYPE_t[:, :, ::1] o = out
+    cdef int i, j
+
+    for i in range(4):
+        for j in range(4):
+            o[i, j, 0] = children[i][j].x
+            o[i, j, 1] = children[i][j].y
+
+    return out
+
+
 @cython.boundscheck(False)
 cdef void _subsample(Point ul, Point ur, Point lr, Point ll,
                     DTYPE_t [:, :] x,
@@ -129,7 +186,7 @@ def subsample(ul, ur, lr, ll, npix, increasing):
 
 @cython.boundscheck(False)
 @cython.wraparound(False)
-cdef void _order_pair_1d(np.ndarray[DTYPE_t, ndim=1] arr, int i, int j):
+cdef inline void _order_pair_1d(DTYPE_t *arr, int i, int j):
     """
     Swap two elements of a 1D array to ensure that that arr[i] < arr[j].
     """
@@ -141,13 +198,14 @@ cdef void _order_pair_1d(np.ndarray[DTYPE_t, ndim=1] arr, int i, int j):
         arr[i] = z
 
 
+DEF PI = 3.14159265358979311600
 DEF TWOPI = 6.28318530717958623200
 
 
 @cython.boundscheck(False)
 @cython.wraparound(False)
 cdef bint _tile_intersects_latlon_bbox(
-    np.ndarray[DTYPE_t, ndim=2] corner_lonlats,
+    const DTYPE_t[:, :] corner_lonlats,
     DTYPE_t bbox_lon_min,
     DTYPE_t bbox_lon_max,
     DTYPE_t bbox_lat_min,
@@ -158,6 +216,7 @@ cdef bint _tile_intersects_latlon_bbox(
 
     This function is implemented in Cython because the np.min/max calls turn out
     to become relatively expensive when this function is called millions of times.
+    The corner array is not modified.
     """
 
     # Latitudes are easy -- no wrapping.
@@ -165,6 +224,7 @@ cdef bint _tile_intersects_latlon_bbox(
     cdef DTYPE_t tile_lat_min = corner_lonlats[0,1]
     cdef DTYPE_t tile_lat_max = tile_lat_min
     cdef DTYPE_t x = 0
+    cdef int i
 
     for i in range(1, 4):
         x = corner_lonlats[i, 1]
@@ -201,7 +261,10 @@ cdef bint _tile_intersects_latlon_bbox(
     # it should ever be). In particular, if the condition isn't met,
     # we add 2pi to the smallest longitude and try again.
 
-    cdef np.ndarray[DTYPE_t, ndim=1] lons = corner_lonlats[:, 0]
+    cdef DTYPE_t lons[4]
+
+    for i in range(4):
+        lons[i] = corner_lonlats[i, 0]
 
     # This "sorting network" always delivers a sorted list:
 
@@ -216,7 +279,7 @@ cdef bint _tile_intersects_latlon_bbox(
 
     cdef DTYPE_t updated_lon = 0
 
-    while lons[3] - lons[0] > np.pi:
+    while lons[3] - lons[0] > PI:
         updated_lon = lons[0] + TWOPI
 
         for i in range(3):
@@ -268,5 +331,76 @@ cdef bint _tile_intersects_latlon_bbox(
 
     return False
 
-def tile_intersects_latlon_bbox(corner_lonlats, bbox_lon_min, bbox_lon_max, bbox_lat_min, bbox_lat_max):
+def tile_intersects_latlon_bbox(
+    const DTYPE_t[:, :] corner_lonlats,
+    DTYPE_t bbox_lon_min,
+    DTYPE_t bbox_lon_max,
+    DTYPE_t bbox_lat_min,
+    DTYPE_t bbox_lat_max
+):
     return _tile_intersects_latlon_bbox(corner_lonlats, bbox_lon_min, bbox_lon_max, bbox_lat_min, bbox_lat_max)
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef void _postfix_pos(int depth, np.int64_t[:] n, np.int64_t[:] x, np.int64_t[:] y):
+    """
+    Fill in tile positions in postfix order. The leaf tiles are visited in
+    Morton (Z-order) order, and after each leaf we emit each of its ancestors
+    for which it is the last descendant.
+    """
+    cdef np.int64_t code, ncodes = (<np.int64_t> 1) << (2 * depth)
+    cdef np.int64_t lx, ly, rest, i = 0
+    cdef int bit, k
+
+    for code in range(ncodes):
+        lx = 0
+        ly = 0
+
+        for bit in range(depth):
+            lx |= ((code >> (2 * bit)) & 1) << bit
+            ly |= ((code >> (2 * bit + 1)) & 1) << bit
+
+        n[i] = depth
+        x[i] = lx
+        y[i] = ly
+        i += 1
+
+        rest = code + 1
+        k = 0
+
+        while k < depth and (rest & 3) == 0:
+            rest >>= 2
+            k += 1
+            n[i] = depth - k
+            x[i] = lx >> k
+            y[i] = ly >> k
+            i += 1
+
+
+def postfix_pos_arrays(int depth):
+    """Compute the tile positions of a pyramid in postfix order
+
+    Parameters
+    ----------
+    depth : int
+        The depth of the pyramid
+
+    Returns
+    -------
+    A tuple ``(n, x, y)`` of int64 arrays of size ``depth2tiles(depth)``
+    """
+    cdef np.int64_t ntiles
+
+    # The traversal writes without bounds checking, so the array size must be
+    # computed here rather than trusted from the caller. Beyond depth 30 the
+    # tile count doesn't fit in 64 bits.
+    if depth < 0 or depth > 30:
+        raise ValueError(f"pyramid depth must be between 0 and 30; got {depth}")
+
+    ntiles = ((<np.int64_t> 1 << (2 * depth + 2)) - 1) // 3
+    n = np.empty(ntiles, dtype=np.int64)
+    x = np.empty(ntiles, dtype=np.int64)
+    y = np.empty(ntiles, dtype=np.int64)
+    _postfix_pos(depth, n, x, y)
+    return n, x, y
@@ -27,9 +27,13 @@ SimpleFitsCollection
 """.split()
 
 from abc import ABC
+from collections import deque, namedtuple
 from glob import glob
 import numpy as np
+import os
 from os.path import join
+import re
+import threading
 import warnings
 
 from .image import Image, ImageDescription, ImageMode
@@ -49,6 +53,131 @@ MATCH_HEADERS = [
 
 ALLOWED_WCS_KEYS = " ABCDEFGHIJKLMNOPQRSTUVWXYZ"
 
+# Marks the end of a file's images in `RubinDirectoryCollection._load()`.
+_END_OF_FILE = object()
+
+# Serializes temporary changes to the (process-global) warning filters.
+#
+# Note that this only coordinates the threads used by the collections in this
+# module. `warnings.catch_warnings()` saves and restores the global filter
+# list, so if another thread in the process changes the filters while one of
+# our threads is inside the `with` block, that change will be lost when the
+# block exits. FITSFixedWarnings raised by other threads in the meantime are
+# also silenced. We accept this rather than installing a permanent filter:
+# `filterwarnings()` scopes filters by the module that *issues* a warning,
+# which is astropy, not us, so a permanent filter would hide FITSFixedWarnings
+# from all code in the process.
+_WARNINGS_LOCK = threading.Lock()
+
+# The Numpy data types corresponding to FITS BITPIX values.
+BITPIX_TO_DTYPE = {
+    8: np.uint8,
+    16: np.int16,
+    32: np.int32,
+    64: np.int64,
+    -32: np.float32,
+    -64: np.float64,
+}
+
+
+def _header_dtype(header):
+    """
+    Determine the data type that Astropy will use for an image HDU's data, based
+    only on its header.
+    """
+    try:
+        dtype = np.dtype(BITPIX_TO_DTYPE[header["BITPIX"]])
+    except KeyError:
+        raise ValueError(f"unsupported FITS BITPIX value {header.get('BITPIX')!r}")
+
+    bscale = header.get("BSCALE", 1)
+    bzero = header.get("BZERO", 0)
+
+    if bscale == 1 and bzero == 0:
+        return dtype
+
+    # This is how FITS represents unsigned integers:
+    if dtype.kind == "i" and bscale == 1 and bzero == 1 << (8 * dtype.itemsize - 1):
+        return np.dtype(f"u{dtype.itemsize}")
+
+    # Otherwise, Astropy scales the data to floats.
+    if dtype.kind == "f":
+        return dtype
+    if dtype.itemsize <= 2:
+        return np.dtype(np.float32)
+    return np.dtype(np.float64)
+
+
+_DATASEC_RE = re.compile(r"^\[\s*(\d+)\s*:\s*(\d+)\s*,\s*(\d+)\s*:\s*(\d+)\s*\]$")
+
+
+def _parse_datasec(section):
+    """
+    Convert a simple FITS ``DATASEC``-style section specification, of the form
+    ``[x1:x2,y1:y2]``, into a tuple of Numpy slices.
+
+    Returns None if the specification is in some other form (for instance, if it
+    flips an axis), in which case the caller should fall back to ``ccdproc``.
+    """
+    m = _DATASEC_RE.match(section.strip())
+    if m is None:
+        return None
+
+    x1, x2, y1, y2 = map(int, m.groups())
+    if x1 < 1 or y1 < 1 or x1 > x2 or y1 > y2:
+        return None
+
+    return (slice(y1 - 1, y2), slice(x1 - 1, x2))
+
+
+# The results of analyzing the WCS of a FITS HDU; see
+# `SimpleFitsCollection._analyze_wcs`.
+_WcsInfo = namedtuple(
+    "_WcsInfo", "wcs full_wcs keep_axes shape data_subset celestial_shape"
+)
+
+# A stand-in for an Astropy HDU when we have only read its header.
+_HeaderInfo = namedtuple("_HeaderInfo", "header shape")
+
+
+def _fitsio_header(hdu):
+    """
+    Read the header of a `fitsio` HDU as an Astropy header.
+    """
+    from astropy.io import fits
+
+    cards = [r["card_string"] for r in hdu.read_header_list()]
+    return fits.Header.fromstring("\n".join(cards), sep="\n")
+
+
+def _fitsio_header_infos(fits_path):
+    """
+    Read the headers and shapes of all of the HDUs in a FITS file using
+    `fitsio`.
+
+    Returns a list of `_HeaderInfo`, or None if `fitsio` is unavailable or
+    can't handle the file, in which case the caller should fall back to Astropy.
+    """
+    try:
+        import fitsio
+    except ImportError:
+        return None
+
+    infos = []
+
+    try:
+        with fitsio.FITS(fits_path) as fits_file:
+            for hdu in fits_file:
+                if hdu.get_exttype() != "IMAGE_HDU" or hdu.is_compressed():
+                    return None
+
+                infos.append(_HeaderInfo(_fitsio_header(hdu), tuple(hdu.get_dims())))
+    except OSError:
+        return None
+
+    return infos
+
+
 class ImageCollection(ABC):
     def descriptions(self):
         """
@@ -138,50 +267,169 @@ class SimpleFitsCollection(ImageCollection):
         self._hdu_index = hdu_index
         self._wcs_key = wcs_key
         self._blankval = blankval
+        self._wcs_cache = {}
+
+    def _get_wcs_key(self, path_index):
+        if isinstance(self._wcs_key, str):
+            return self._wcs_key
+        elif self._wcs_key is not None:
+            return self._wcs_key[path_index]
+        return " "
 
-    def _scan_hdus(self):
+    def _scan_hdus(self, header_only=False):
+        for path_index, fits_path in enumerate(self._paths):
+            yield from self._scan_file_astropy(path_index, fits_path, header_only)
+
+    def _scan_file_astropy(self, path_index, fits_path, header_only=False):
         from astropy.io import fits
 
+        # With lazy loading, HDUs past the one we want are never parsed. If we
+        # only need headers, turning off scaling keeps `BZERO` and `BSCALE` in
+        # them, so that we can infer the data type without reading any data.
+        with fits.open(
+            fits_path, lazy_load_hdus=True, do_not_scale_image_data=header_only
+        ) as hdul:
+            if isinstance(self._hdu_index, int):
+                hdu_index = self._hdu_index
+                hdu = hdul[hdu_index]
+            elif self._hdu_index is not None:
+                hdu_index = self._hdu_index[path_index]
+                hdu = hdul[hdu_index]
+            else:
+                for hdu_index, hdu in enumerate(hdul):
+                    if (
+                        hasattr(hdu, "shape")
+                        and len(hdu.shape) > 1
+                        and type(hdu) is not fits.hdu.table.BinTableHDU
+                    ):
+                        break
+
+            if type(hdu) is fits.hdu.table.BinTableHDU:
+                raise Exception(
+                    f"cannot process input `{fits_path}`: Did not find any HDU with image data"
+                )
+
+            yield fits_path, hdu_index, hdu, self._get_wcs_key(path_index)
+
+    def _scan_headers(self):
+        """
+        Like `_scan_hdus`, but the yielded "HDUs" are only guaranteed to provide
+        `header` and `shape` attributes.
+
+        If `fitsio` is available, we use it, since it can read headers much
+        faster than Astropy, which matters when scanning large collections.
+        """
+        try:
+            import fitsio
+        except ImportError:
+            yield from self._scan_hdus(header_only=True)
+            return
+
         for path_index, fits_path in enumerate(self._paths):
-            with fits.open(fits_path) as hdul:
-                if isinstance(self._hdu_index, int):
-                    hdu_index = self._hdu_index
-                    hdu = hdul[self._hdu_index]
-                elif self._hdu_index is not None:
-                    hdu_index = self._hdu_index[path_index]
-                    hdu = hdul[self._hdu_index]
-                else:
-                    for hdu_index, hdu in enumerate(hdul):
-                        if (
-                            hasattr(hdu, "shape")
-                            and len(hdu.shape) > 1
-                            and type(hdu) is not fits.hdu.table.BinTableHDU
-                        ):
-                            break
-
-                if type(hdu) is fits.hdu.table.BinTableHDU:
-                    raise Exception(
-                        f"cannot process input `{fits_path}`: Did not find any HDU with image data"
-                    )
+            try:
+                item = self._scan_file_fitsio(fitsio, path_index, fits_path)
+            except OSError:
+                # fitsio is stricter than Astropy about malformed headers.
+                item = None
 
-                if isinstance(self._wcs_key, str):
-                    wcs_key = self._wcs_key
-                elif self._wcs_key is not None:
-                    wcs_key = self._wcs_key[path_index]
-                else:
-                    wcs_key = " "
+            if item is None:
+                yield from self._scan_file_astropy(path_index, fits_path, True)
+            else:
+                yield item
+
+    def _scan_file_fitsio(self, fitsio, path_index, fits_path):
+        with fitsio.FITS(fits_path) as fits_file:
+            if isinstance(self._hdu_index, int):
+                hdu_index = self._hdu_index
+            elif self._hdu_index is not None:
+                hdu_index = self._hdu_index[path_index]
+            else:
+                for hdu_index, hdu in enumerate(fits_file):
+                    if hdu.get_exttype() == "IMAGE_HDU" and len(hdu.get_dims()) > 1:
+                        break
+
+            hdu = fits_file[hdu_index]
+            exttype = hdu.get_exttype()
 
-                yield fits_path, hdu_index, hdu, wcs_key
+            if exttype == "BINARY_TBL":
+                raise Exception(
+                    f"cannot process input `{fits_path}`: Did not find any HDU with image data"
+                )
+
+            # fitsio gives us the raw table header for compressed images, so
+            # we leave those (and any other oddballs) to Astropy.
+            if exttype != "IMAGE_HDU" or hdu.is_compressed():
+                return None
+
+            info = _HeaderInfo(_fitsio_header(hdu), tuple(hdu.get_dims()))
+
+        return fits_path, hdu_index, info, self._get_wcs_key(path_index)
 
     def export_simple(self):
         # We're allowed to return a generator, but we listify this so that the
         # FITS files are all closed promptly.
         return [(t[0], t[1]) for t in self._scan_hdus()]
 
-    def _load(self, actually_load_data):
+    def _analyze_wcs(self, fits_path, header, wcs_key, shape):
+        """
+        Compute the celestial WCS for an HDU.
+
+        Returns a `_WcsInfo`. If the original WCS had more than two axes, its
+        ``full_wcs`` is that original WCS, ``keep_axes`` is a boolean array
+        indicating which data axes are celestial, ``data_subset`` is an indexer
+        that extracts the celestial plane from the data, and
+        ``celestial_shape`` is the shape of that plane; otherwise, these are all
+        None. In both cases, ``shape`` is the data shape including any virtual
+        axes.
+        """
         from astropy.wcs import WCS
 
-        for fits_path, _hdu_index, hdu, wcs_key in self._scan_hdus():
+        wcs = WCS(header, key=wcs_key)
+        wcs.wcs.alt = " " # force wcs to forget about the key; we don't want to preserve it
+
+        if wcs.naxis >= len(shape):
+            # Sometimes the WCS defines more axes than are in the data cube;
+            # this should generally mean that there are virtual coordinate
+            # axes that we can think of as adding extra size-1 dimensions.
+            shape = (1,) * (wcs.naxis - len(shape)) + shape
+
+        # We need to make sure the data are 2D celestial, since that's
+        # what our image code and `reproject` (if it's being used) expect.
+
+        full_wcs = None
+        keep_axes = None
+        data_subset = None
+        celestial_shape = None
+
+        if wcs.naxis != 2:
+            if not wcs.has_celestial:
+                raise Exception(
+                    f"cannot process input `{fits_path}`: WCS cannot be reduced to 2D celestial"
+                )
+
+            full_wcs = wcs
+            wcs = full_wcs.celestial
+
+            # note: get_axis_types returns axes in FITS order, innermost first
+            keep_axes = np.fromiter(
+                (
+                    t.get("coordinate_type") == "celestial"
+                    for t in full_wcs.get_axis_types()[::-1]
+                ),
+                dtype=bool,
+            )
+            data_subset = tuple(slice(None) if k else 0 for k in keep_axes)
+            celestial_shape = tuple(np.compress(keep_axes, shape).tolist())
+
+        return _WcsInfo(wcs, full_wcs, keep_axes, shape, data_subset, celestial_shape)
+
+    def _load(self, actually_load_data):
+        if actually_load_data:
+            scan = self._scan_hdus()
+        else:
+            scan = self._scan_headers()
+
+        for fits_path, _hdu_index, hdu, wcs_key in scan:
             # Hack for DASCH files, and potentially others. These have TPV
             # polynomial distortions but do not use the magic projection
             # keyword that causes Astropy to accept them. We don't try to be
@@ -209,38 +457,21 @@ class SimpleFitsCollection(ImageCollection):
 
             # End hack(s).
 
-            wcs = WCS(hdu.header, key=wcs_key)
-            wcs.wcs.alt = " " # force wcs to forget about the key; we don't want to preserve it
-            shape = hdu.shape
-
-            if wcs.naxis >= len(shape):
-                # Sometimes the WCS defines more axes than are in the data cube;
-                # this should generally mean that there are virtual coordinate
-                # axes that we can think of as adding extra size-1 dimensions.
-                shape = (1,) * (wcs.naxis - len(shape)) + shape
+            # Constructing WCS objects is fairly expensive, and collections are
+            # often scanned more than once, so we cache them.
 
-            # We need to make sure the data are 2D celestial, since that's
-            # what our image code and `reproject` (if it's being used) expect.
+            cache_key = (hdu.header.tostring(), wcs_key, hdu.shape)
+            wcs_info = self._wcs_cache.get(cache_key)
 
-            full_wcs = None
-            keep_axes = None
+            if wcs_info is None:
+                wcs_info = self._analyze_wcs(fits_path, hdu.header, wcs_key, hdu.shape)
+                self._wcs_cache[cache_key] = wcs_info
 
-            if wcs.naxis != 2:
-                if not wcs.has_celestial:
-                    raise Exception(
-                        f"cannot process input `{fits_path}`: WCS cannot be reduced to 2D celestial"
-                    )
-
-                full_wcs = wcs
-                wcs = full_wcs.celestial
-
-                # note: get_axis_types returns axes in FITS order, innermost first
-                keep_axes = [
-                    t.get("coordinate_type") == "celestial"
-                    for t in full_wcs.get_axis_types()[::-1]
-                ]
+            wcs = wcs_info.wcs
+            shape = wcs_info.shape
 
-                for axnum, (keep, axlen) in enumerate(zip(keep_axes, shape)):
+            if wcs_info.full_wcs is not None:
+                for axnum, (keep, axlen) in enumerate(zip(wcs_info.keep_axes, shape)):
                     if not keep and axlen != 1:
                         warnings.warn(
                             f"taking 0'th plane of non-celestial axis #{axnum} in input `{fits_path}`"
@@ -252,21 +483,21 @@ class SimpleFitsCollection(ImageCollection):
                 # Reshape in case of extra WCS axes:
                 data = hdu.data.reshape(shape)
 
-                if full_wcs is not None:  # need to subset?
-                    data = data[tuple(slice(None) if k else 0 for k in keep_axes)]
+                if wcs_info.full_wcs is not None:  # need to subset?
+                    data = data[wcs_info.data_subset]
 
                 if self._blankval is not None:
                     data[data == self._blankval] = np.nan
 
                 result = Image.from_array(data, wcs=wcs, default_format="fits")
             else:
-                if full_wcs is not None:  # need to subset?
-                    shape = tuple(t[1] for t in zip(keep_axes, shape) if t[0])
+                if wcs_info.full_wcs is not None:  # need to subset?
+                    shape = wcs_info.celestial_shape
 
-                if hasattr(hdu, "dtype"):
-                    mode = ImageMode.from_array_info(shape, hdu.dtype)
-                else:
-                    mode = None  # CompImageHDU doesn't have dtype
+                try:
+                    mode = ImageMode.from_array_info(shape, _header_dtype(hdu.header))
+                except ValueError:
+                    mode = None  # no corresponding toasty mode
 
                 result = ImageDescription(mode=mode, shape=shape, wcs=wcs)
 
@@ -291,76 +522,220 @@ class RubinDirectoryCollection(ImageCollection):
     trimmed according to their ``DATASEC`` specification before being returned.
 
     This class requires the ``ccdproc``  package to trim FITS CCD datasets.
+
+    Parameters
+    ----------
+    dirname : str
+        The directory containing the FITS files.
+    unit : optional :class:`astropy.units.Unit`
+        The unit to assign to the image data.
+    parallel : optional integer, defaults to 1
+        The number of files to read concurrently, using threads. By default,
+        files are read serially. Images are still yielded in a consistent order.
+
+    Notes
+    -----
+    Each file being read concurrently holds up to two loaded images in
+    memory: the one being read and one waiting to be yielded. So, larger
+    values of *parallel* trade memory for I/O throughput. With serial
+    processing, only the image being yielded is held.
     """
 
-    def __init__(self, dirname, unit=None):
+    def __init__(self, dirname, unit=None, parallel=1):
         self._dirname = dirname
         self._unit = unit
+        self._parallel = parallel
+        self._wcs_cache = {}
 
     def _load(self, actually_load_data):
+        from concurrent.futures import ThreadPoolExecutor
+        import queue
+
+        paths = sorted(glob(join(self._dirname, "*.fits")))
+        parallel = self._parallel or 1
+
+        if parallel < 2:
+            for fits_path in paths:
+                yield from self._load_file(fits_path, actually_load_data)
+            return
+
+        # Each file is processed independently, and the work is largely
+        # I/O-bound, so threads work well. Each file in flight hands its
+        # images to us one at a time through a queue with room for a single
+        # item, so that a reader can get one image ahead of us but no more.
+        # We consume the files in order, starting a new one whenever one is
+        # finished.
+
+        stop = threading.Event()
+
+        def put(q, item):
+            # Don't block forever if our consumer has gone away.
+            while not stop.is_set():
+                try:
+                    q.put(item, timeout=0.1)
+                    return
+                except queue.Full:
+                    pass
+
+        def produce(fits_path, q):
+            try:
+                for item in self._load_file(fits_path, actually_load_data):
+                    put(q, (item, None))
+
+                    if stop.is_set():
+                        return
+
+                put(q, (_END_OF_FILE, None))
+            except BaseException as e:
+                put(q, (None, e))
+
+        paths = iter(paths)
+        pending = deque()
+
+        def start_next(executor):
+            fits_path = next(paths, None)
+
+            if fits_path is not None:
+                q = queue.Queue(maxsize=1)
+                executor.submit(produce, fits_path, q)
+                pending.append(q)
+
+        with ThreadPoolExecutor(max_workers=parallel) as executor:
+            try:
+                for _ in range(parallel):
+                    start_next(executor)
+
+                while pending:
+                    item, exc = pending[0].get()
+
+                    if exc is not None:
+                        raise exc
+
+                    if item is _END_OF_FILE:
+                        pending.popleft()
+                        start_next(executor)
+                    else:
+                        yield item
+            finally:
+                stop.set()
+
+    def _load_file(self, fits_path, actually_load_data):
+        """
+        Generate the images or descriptions from one FITS file, one HDU at a
+        time.
+        """
         from astropy.io import fits
+
+        # `astropy.nddata.ccddata.fits_ccddata_reader` only opens FITS from
+        # filenames, not from an open HDUList, which means that creating
+        # multiple CCDDatas from the same FITS file rapidly becomes
+        # inefficient. So, we emulate its logic.
+
+        if not actually_load_data:
+            header_infos = _fitsio_header_infos(fits_path)
+
+            if header_infos is not None:
+                yield from self._load_hdus(fits_path, header_infos, False)
+                return
+
+        with fits.open(fits_path, lazy_load_hdus=True) as hdu_list:
+            yield from self._load_hdus(fits_path, hdu_list, actually_load_data)
+
+    def _load_hdus(self, fits_path, hdus, actually_load_data):
         from astropy.nddata import ccddata
-        import ccdproc
-
-        for fits_path in glob(join(self._dirname, "*.fits")):
-            # `astropy.nddata.ccddata.fits_ccddata_reader` only opens FITS from
-            # filenames, not from an open HDUList, which means that creating
-            # multiple CCDDatas from the same FITS file rapidly becomes
-            # inefficient. So, we emulate its logic.
-
-            with fits.open(fits_path) as hdu_list:
-                for idx, hdu in enumerate(hdu_list):
-                    if idx == 0:
-                        header0 = hdu.header
-                    else:
-                        hdr = hdu.header
-                        hdr.extend(header0, unique=True)
-
-                        # This ccddata function often generates annoying warnings
-                        with warnings.catch_warnings():
-                            warnings.simplefilter("ignore")
-                            hdr, wcs = ccddata._generate_wcs_and_update_header(hdr)
-
-                        # We can't use `ccdproc.trim_image()` without having a
-                        # CCDData in hand, so we have to create a fake empty
-                        # array even when we're not actually loading any data.
-                        #
-                        # Note: we skip all the unit-handling logic from
-                        # `fits_ccddata_reader` here basically since the LSST
-                        # sim data I'm using don't have anything useful.
-
-                        if actually_load_data:
-                            data = hdu.data
-
-                            if data.dtype.kind == "i":
-                                data = data.astype(np.float32)
-                        else:
-                            data = np.empty(hdu.shape, dtype=np.void)
-
-                        ccd = ccddata.CCDData(data, meta=hdr, unit=self._unit, wcs=wcs)
-                        ccd = ccdproc.trim_image(
-                            ccd, fits_section=ccd.header["DATASEC"]
-                        )
-                        data = ccd.data
+        from astropy.wcs import FITSFixedWarning
+
+        for idx, hdu in enumerate(hdus):
+            if idx == 0:
+                header0 = hdu.header
+            else:
+                hdr = hdu.header
+                hdr.extend(header0, unique=True)
+
+                # Constructing the WCS is fairly expensive, and collections
+                # are often scanned more than once, so we cache the results.
+                cache_key = hdr.tostring()
+                cached = self._wcs_cache.get(cache_key)
+
+                if cached is not None:
+                    hdr, wcs = cached[0].copy(), cached[1]
+                else:
+                    # This ccddata function often generates annoying warnings
+                    # about nonstandard WCS headers, which we silence without
+                    # hiding anything else. This only happens on cache misses,
+                    # but the warning filters are process-global, so we need
+                    # to make sure that our threads don't clobber each other's
+                    # changes. See _WARNINGS_LOCK for the limitations.
+                    with _WARNINGS_LOCK, warnings.catch_warnings():
+                        warnings.simplefilter("ignore", FITSFixedWarning)
+                        hdr, wcs = ccddata._generate_wcs_and_update_header(hdr)
+
+                    self._wcs_cache[cache_key] = (hdr.copy(), wcs)
+
+                # We can usually apply the trim to the data, shape, and WCS
+                # directly.
+
+                trim_slices = _parse_datasec(hdr["DATASEC"])
+
+                if trim_slices is not None:
+                    if actually_load_data:
+                        data = hdu.data[trim_slices]
                         shape = data.shape
-                        wcs = ccd.wcs
-
-                        if actually_load_data:
-                            mode = ImageMode.from_array_info(shape, data.dtype)
-                        elif hasattr(hdu, "dtype"):
-                            mode = ImageMode.from_array_info(shape, hdu.dtype)
-                        else:
-                            mode = None  # CompImageHDU doesn't have dtype
-
-                        if actually_load_data:
-                            result = Image.from_array(
-                                data, wcs=wcs, default_format="fits"
-                            )
-                        else:
-                            result = ImageDescription(mode=mode, shape=shape, wcs=wcs)
-
-                        result.collection_id = f"{fits_path}:{idx}"
-                        yield result
+                    else:
+                        # Slicing a zero-size void array is an easy way to get
+                        # the same shape semantics as slicing the real data.
+                        shape = np.empty(hdu.shape, dtype=np.void)[trim_slices].shape
+
+                    if wcs is not None:
+                        wcs = wcs.slice(trim_slices)
+                else:
+                    import ccdproc
+
+                    # We can't use `ccdproc.trim_image()` without having a
+                    # CCDData in hand, so we have to create a fake empty
+                    # array if we're not actually loading any data.
+                    #
+                    # Note: we skip all the unit-handling logic from
+                    # `fits_ccddata_reader` here basically since the LSST
+                    # sim data I'm using don't have anything useful.
+
+                    if actually_load_data:
+                        data = hdu.data
+                    else:
+                        data = np.empty(hdu.shape, dtype=np.void)
+
+                    ccd = ccddata.CCDData(data, meta=hdr, unit=self._unit, wcs=wcs)
+                    ccd = ccdproc.trim_image(ccd, fits_section=ccd.header["DATASEC"])
+                    data = ccd.data
+                    shape = data.shape
+                    wcs = ccd.wcs
+
+                if actually_load_data:
+                    # Convert after trimming, so that we only touch the pixels
+                    # that we keep.
+                    if data.dtype.kind == "i":
+                        data = data.astype(np.float32)
+
+                    mode = ImageMode.from_array_info(shape, data.dtype)
+                else:
+                    try:
+                        dtype = _header_dtype(hdu.header)
+
+                        # Match the conversion done when loading the data.
+                        if dtype.kind == "i":
+                            dtype = np.float32
+
+                        mode = ImageMode.from_array_info(shape, dtype)
+                    except ValueError:
+                        mode = None  # no corresponding toasty mode
+
+                if actually_load_data:
+                    result = Image.from_array(data, wcs=wcs, default_format="fits")
+                else:
+                    result = ImageDescription(mode=mode, shape=shape, wcs=wcs)
+
+                result.collection_id = f"{fits_path}:{idx}"
+                yield result
 
     def descriptions(self):
         return self._load(False)
@@ -27,6 +27,7 @@ import numpy as np
 import warnings
 import sys
 import os
+import threading
 
 try:
     from astropy.io import fits
@@ -41,6 +42,9 @@ PIL_FORMATS = PIL_RGB_FORMATS.copy()
 PIL_FORMATS.update(PIL_RGBA_FORMATS)
 SUPPORTED_FORMATS = list(PIL_RGB_FORMATS) + list(PIL_RGBA_FORMATS) + ["npy"]
 
+# Protects our temporary changes to PIL's global decompression-bomb limit.
+_PIL_MAX_PIXELS_LOCK = threading.Lock()
+
 if ASTROPY_INSTALLED:
     SUPPORTED_FORMATS += ["fits"]
 
@@ -609,14 +613,17 @@ class ImageLoader(object):
         # mode where we get a Numpy array but not a PIL image. For now, just
         # pass it off to PIL and hope for the best.
 
-        # Prevent PIL decompression-bomb aborts. Not thread-safe, of course.
-        old_max = pil_image.MAX_IMAGE_PIXELS
+        # Prevent PIL decompression-bomb aborts. The limit is global, so we
+        # need a lock to be thread-safe. `open()` only reads the image header,
+        # so this doesn't serialize much work.
+        with _PIL_MAX_PIXELS_LOCK:
+            old_max = pil_image.MAX_IMAGE_PIXELS
 
-        try:
-            pil_image.MAX_IMAGE_PIXELS = None
-            pilimg = pil_image.open(stream)
-        finally:
-            pil_image.MAX_IMAGE_PIXELS = old_max
+            try:
+                pil_image.MAX_IMAGE_PIXELS = None
+                pilimg = pil_image.open(stream)
+            finally:
+                pil_image.MAX_IMAGE_PIXELS = old_max
 
         # Now pass it off to generic PIL handling ...
         return self.load_pil(pilimg)
@@ -47,6 +47,14 @@ SLICES_OPPOSITE_PARITY = [
 ]
 
 
+def _halve(sl):
+    """Map a quadrant slice of a 512-pixel axis onto a 256-pixel axis."""
+    return slice(
+        None if sl.start is None else sl.start // 2,
+        None if sl.stop is None else sl.stop // 2,
+    )
+
+
 def averaging_merger(data):
     """A merger function that averages quartets of pixels.
 
@@ -62,6 +70,25 @@ def averaging_merger(data):
     """
     s = (data.shape[0] // 2, 2, data.shape[1] // 2, 2) + data.shape[2:]
 
+    if data.dtype.kind in "iu" and data.dtype.itemsize < 8:
+        # Integer data (including RGB and RGBA) can't contain NaNs, and we can
+        # sum quartets in an integer type of twice the width without
+        # overflow. Shifting the sum gives the same result as truncating the
+        # mean, but is much faster than computing it in floating point.
+        # Shifts round towards negative infinity, so negative sums are biased
+        # by 3 first in order to round towards zero like the float path does.
+        v = data.reshape(s)
+        acc = v[:, 0, :, 0].astype(f"{data.dtype.kind}{2 * data.dtype.itemsize}")
+        acc += v[:, 0, :, 1]
+        acc += v[:, 1, :, 0]
+        acc += v[:, 1, :, 1]
+
+        if data.dtype.kind == "i":
+            acc += (acc >> (8 * acc.dtype.itemsize - 1)) & 3
+
+        acc >>= 2
+        return acc.astype(data.dtype)
+
     # nanmean will raise a RuntimeWarning if there are all-NaN quartets. This
     # gets annoying, so we silence them.
     with warnings.catch_warnings():
@@ -143,6 +170,13 @@ class TileMerger(object):
         self._pio = pio
         self._merger = merger
         self._buf = None
+        self._scratch = None
+        self._empty_quadrant = None
+
+        # The averaging merger only combines pixels within a single child
+        # tile, so we can downsample each child straight into its quadrant of
+        # the output rather than assembling a full-resolution 512×512 mosaic.
+        self._by_quadrant = merger is averaging_merger
 
         # Pyramids always follow a negative-parity (JPEG-like) coordinate system:
         # tile X=0,Y=0 is at the top left. The file formats for individual tiles may
@@ -181,10 +215,19 @@ class TileMerger(object):
         if img0 is None and img1 is None and img2 is None and img3 is None:
             return
 
+        if self._by_quadrant:
+            merged = self._merge_by_quadrant((img0, img1, img2, img3))
+        else:
+            merged = self._merge_mosaic((img0, img1, img2, img3))
+
+        min_value, max_value = self._get_min_max_of_children([img0, img1, img2, img3])
+        self._pio.write_image(pos, merged, min_value=min_value, max_value=max_value)
+
+    def _merge_mosaic(self, images):
         if self._buf is not None:
             self._buf.clear()
 
-        for slidx, subimg in zip(self._slices, (img0, img1, img2, img3)):
+        for slidx, subimg in zip(self._slices, images):
             if subimg is not None:
                 if self._buf is None:
                     self._buf = subimg.mode.make_maskable_buffer(512, 512)
@@ -197,9 +240,42 @@ class TileMerger(object):
                     *slidx,  # buffer indexer: appropriate sub-quadrant
                 )
 
-        merged = Image.from_array(self._merger(self._buf.asarray()))
-        min_value, max_value = self._get_min_max_of_children([img0, img1, img2, img3])
-        self._pio.write_image(pos, merged, min_value=min_value, max_value=max_value)
+        return Image.from_array(self._merger(self._buf.asarray()))
+
+    def _merge_by_quadrant(self, images):
+        # Here, self._scratch holds one child at a time, converted into
+        # maskable form so that the downsampled result matches what we'd get
+        # from the full mosaic. The output is a new array every time, since the
+        # caller might hold on to it.
+        out = None
+
+        for (sly, slx), subimg in zip(self._slices, images):
+            if subimg is None:
+                continue
+
+            if self._scratch is None:
+                self._scratch = subimg.mode.make_maskable_buffer(256, 256)
+                self._scratch.clear()
+                self._empty_quadrant = averaging_merger(self._scratch.asarray())
+
+            self._scratch.clear()
+            subimg.update_into_maskable_buffer(
+                self._scratch, slice(None), slice(None), slice(None), slice(None)
+            )
+            small = averaging_merger(self._scratch.asarray())
+
+            if out is None:
+                out = np.empty((256, 256) + small.shape[2:], dtype=small.dtype)
+
+            out[_halve(sly), _halve(slx)] = small
+
+        # Missing quadrants get the result of downsampling an all-masked child,
+        # exactly as they would in the mosaic.
+        for (sly, slx), subimg in zip(self._slices, images):
+            if subimg is None:
+                out[_halve(sly), _halve(slx)] = self._empty_quadrant
+
+        return Image.from_array(out)
 
     def _get_min_max_of_children(self, children):
         min_value = None
@@ -195,10 +195,13 @@ def init_setup_parser(parser):
 
 
 def _pipeline_io_from_settings(settings):
-    from . import azure_io, local_io
+    # Import the backends lazily: the Azure SDK is slow to load, and we don't
+    # want to pay that cost for local-only processing.
 
     if settings.local:
-        return local_io.LocalPipelineIo(settings.local)
+        from .local_io import LocalPipelineIo
+
+        return LocalPipelineIo(settings.local)
 
     if settings.azure_conn_env:
         conn_str = os.environ.get(settings.azure_conn_env)
@@ -215,6 +218,8 @@ def _pipeline_io_from_settings(settings):
         if not path_prefix:
             path_prefix = ""
 
+        from . import azure_io
+
         azure_io.assert_enabled()
 
         return azure_io.AzureBlobPipelineIo(
@@ -36,6 +36,10 @@ class LocalPipelineIo(PipelineIo):
     def __init__(self, path_prefix):
         self._path_prefix = path_prefix
 
+        # Directories that we know exist, so that we don't need to issue a
+        # syscall for every item that we store.
+        self._dirs_made = set()
+
     def _export_config(self):
         return {
             '_type': 'local',
@@ -60,7 +64,10 @@ class LocalPipelineIo(PipelineIo):
         fpath = self._make_item_name(path)
 
         cdir = os.path.split(fpath)[0]
-        os.makedirs(cdir, exist_ok=True)
+
+        if cdir not in self._dirs_made:
+            os.makedirs(cdir, exist_ok=True)
+            self._dirs_made.add(cdir)
 
         with open(fpath, 'wb') as f:
             shutil.copyfileobj(source, f)
@@ -29,8 +29,9 @@ def progress_bar(total=None, show=None):
 
     Parameters
     ----------
-    total : int
-        The total number of items to be processed.
+    total : int or None
+        The total number of items to be processed. This may only be None if
+        the progress bar is not to be shown.
     show : bool
         Whether the progress bar should actually be shown.
 
@@ -50,8 +51,8 @@ def progress_bar(total=None, show=None):
     stdout is a pipe but we probably still want to use the terminal-like
     progress bar output."""
 
-    assert total is not None
     assert show is not None
+    assert total is not None or not show
 
     args = dict(
         total=total,
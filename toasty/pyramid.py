@@ -13,45 +13,68 @@ overlapping functionality."""
 __all__ = """
 depth2tiles
 generate_pos
+generate_pos_arrays
 is_subtile
 next_highest_power_of_2
 Pos
 pos_children
+pos_children_soa
 pos_parent
 guess_base_layer_level
 Pyramid
 PyramidIO
+PyramidIOContainer
+ShardedPyramidIO
+pack_sharded_pyramid
 tiles_at_depth
 """.split()
 
 import glob
-from collections import namedtuple
+from collections import deque, namedtuple, OrderedDict
 from contextlib import contextmanager
+import copy
+import io
+import json
 import os.path
+import threading
 import time
 
-from .image import ImageLoader, SUPPORTED_FORMATS, get_format_vertical_parity_sign
+import numpy as np
+
+from .image import (
+    Image,
+    ImageLoader,
+    SUPPORTED_FORMATS,
+    get_format_vertical_parity_sign,
+)
+from ._libtoasty import postfix_pos_arrays
 from .progress import progress_bar
 
 Pos = namedtuple("Pos", "n x y")
 
 
 def next_highest_power_of_2(n):
-    """Ugh, this implementation is so dumb.
+    """Return the smallest power of 2 that is greater than or equal to the
+    integer *n*.
 
     We also assume that we are being called in a tiling context, in which case
     numbers less than 256 should be bumped up to 256 (the number of pixels in
     a single tile).
 
     """
-    p = 256
-    while p < n:
-        p *= 2
-    return p
+    if n <= 256:
+        return 256
+    return 1 << (n - 1).bit_length()
+
+
+# Tile counts for the pyramid depths that come up in practice.
+_DEPTH2TILES = [(4 ** (d + 1) - 1) // 3 for d in range(33)]
 
 
 def depth2tiles(depth):
     """Return the total number of tiles in a WWT tile pyramid of depth *depth*."""
+    if 0 <= depth < len(_DEPTH2TILES):
+        return _DEPTH2TILES[depth]
     return (4 ** (depth + 1) - 1) // 3
 
 
@@ -77,13 +100,16 @@ def is_subtile(deeper_pos, shallower_pos):
     True if *deeper_pos* represents a tile that is a child of *shallower_pos*.
 
     """
-    if deeper_pos.n < shallower_pos.n:
-        raise ValueError("deeper_pos has a lower depth than shallower_pos")
+    dn = deeper_pos.n - shallower_pos.n
 
-    if deeper_pos.n == shallower_pos.n:
-        return deeper_pos.x == shallower_pos.x and deeper_pos.y == shallower_pos.y
+    if dn < 0:
+        raise ValueError("deeper_pos has a lower depth than shallower_pos")
 
-    return is_subtile(pos_parent(deeper_pos)[0], shallower_pos)
+    # Walking up the parent chain *dn* times is equivalent to shifting the
+    # indices right by *dn* bits.
+    return (deeper_pos.x >> dn) == shallower_pos.x and (
+        deeper_pos.y >> dn
+    ) == shallower_pos.y
 
 
 def pos_parent(pos):
@@ -107,8 +133,8 @@ def pos_parent(pos):
     if pos.n < 1:
         raise ValueError("cannot take the parent of a tile position with depth < 1")
 
-    parent = Pos(n=pos.n - 1, x=pos.x // 2, y=pos.y // 2)
-    return parent, pos.x % 2, pos.y % 2
+    x, y = pos.x, pos.y
+    return Pos(pos.n - 1, x >> 1, y >> 1), x & 1, y & 1
 
 
 def pos_children(pos):
@@ -126,28 +152,83 @@ def pos_children(pos):
     be: top left, top right, bottom left, bottom right.
 
     """
-    n, x, y = pos.n, pos.x, pos.y
-    n += 1
-    x *= 2
-    y *= 2
+    n = pos.n + 1
+    x = pos.x << 1
+    y = pos.y << 1
 
     return [
-        Pos(n=n, x=x, y=y),
-        Pos(n=n, x=x + 1, y=y),
-        Pos(n=n, x=x, y=y + 1),
-        Pos(n=n, x=x + 1, y=y + 1),
+        Pos(n, x, y),
+        Pos(n, x + 1, y),
+        Pos(n, x, y + 1),
+        Pos(n, x + 1, y + 1),
     ]
 
 
-def _postfix_pos(pos, depth):
-    if pos.n > depth:
-        return
+def pos_children_soa(n, x, y):
+    """Return the children of tile positions given as arrays.
+
+    This is a vectorized version of :func:`pos_children` for processing many
+    tiles at once without creating :class:`Pos` instances.
+
+    Parameters
+    ----------
+    n : integer or array of integers
+        The depths of the tile positions.
+    x : integer or array of integers
+        The X indices of the tile positions.
+    y : integer or array of integers
+        The Y indices of the tile positions.
+
+    Returns
+    -------
+    A tuple ``(ns, xs, ys)`` of integer arrays, each four times the size of the
+    (broadcast) inputs. The four children of the input position at index *i*
+    are at indices ``4 * i`` through ``4 * i + 3``, in the same order as
+    returned by :func:`pos_children`.
+
+    """
+    n, x, y = np.broadcast_arrays(
+        *(np.asarray(a, dtype=np.int64).ravel() for a in (n, x, y))
+    )
+
+    ns = np.repeat(n + 1, 4)
+    xs = (np.repeat(x, 4).reshape((-1, 4)) << 1) + [0, 1, 0, 1]
+    ys = (np.repeat(y, 4).reshape((-1, 4)) << 1) + [0, 0, 1, 1]
+    return ns, xs.ravel(), ys.ravel()
+
+
+# When generating positions one at a time, we compute the postfix ordering of
+# subpyramids of this depth in bulk and stitch them together. This bounds the
+# memory usage while amortizing the array computations over many positions.
+_POS_CHUNK_DEPTH = 6
+
+
+def generate_pos_arrays(depth):
+    """Compute a pyramid of tile positions as arrays.
+
+    The positions are in the same order as those yielded by
+    :func:`generate_pos`.
+
+    Parameters
+    ----------
+    depth : int
+        The tile depth to recurse to.
+
+    Returns
+    -------
+    A tuple ``(n, x, y)`` of integer arrays, each of size
+    ``depth2tiles(depth)``, giving the tile positions.
 
-    for immed_child in pos_children(pos):
-        for item in _postfix_pos(immed_child, depth):
-            yield item
+    Notes
+    -----
+    The positions are computed in compiled code, in one go, so the memory
+    footprint of the arrays grows as ``4**depth``. For deep pyramids, prefer
+    :func:`generate_pos`.
+    """
+    if depth < 0:
+        raise ValueError(f"pyramid depth must be nonnegative; got {depth}")
 
-    yield pos
+    return postfix_pos_arrays(depth)
 
 
 def generate_pos(depth):
@@ -168,8 +249,100 @@ def generate_pos(depth):
         An individual position to process.
 
     """
-    for item in _postfix_pos(Pos(0, 0, 0), depth):
-        yield item
+    # A negative depth describes an empty pyramid.
+    if depth < 0:
+        return
+
+    sub_depth = min(depth, _POS_CHUNK_DEPTH)
+    sub_n, sub_x, sub_y = (a.tolist() for a in generate_pos_arrays(sub_depth))
+
+    if depth == sub_depth:
+        yield from map(Pos._make, zip(sub_n, sub_x, sub_y))
+        return
+
+    # For deeper pyramids, we stack up chunks of at most _POS_CHUNK_DEPTH
+    # levels, replacing each leaf of one chunk with the entire next chunk down.
+    # Rather than nesting generators, we keep an explicit stack of partially
+    # consumed chunk iterators. The leaf that a chunk replaces is yielded as the
+    # final, ``n = 0`` position of that chunk.
+
+    chunk_depths = [sub_depth]
+    remaining = depth - sub_depth
+
+    while remaining:
+        chunk_depths.append(min(remaining, _POS_CHUNK_DEPTH))
+        remaining -= chunk_depths[-1]
+
+    chunk_depths.reverse()
+    chunks = {sub_depth: (sub_n, sub_x, sub_y)}
+
+    for d in chunk_depths:
+        if d not in chunks:
+            chunks[d] = tuple(a.tolist() for a in generate_pos_arrays(d))
+
+    last = len(chunk_depths) - 1
+    stack = [(0, 0, 0, 0, zip(*chunks[chunk_depths[0]]))]
+
+    while stack:
+        level, top, tx, ty, it = stack[-1]
+
+        if level == last:
+            for n, x, y in it:
+                yield Pos(n + top, (tx << n) + x, (ty << n) + y)
+
+            stack.pop()
+            continue
+
+        leaf_n = chunk_depths[level]
+
+        for n, x, y in it:
+            if n == leaf_n:
+                stack.append(
+                    (
+                        level + 1,
+                        n + top,
+                        (tx << n) + x,
+                        (ty << n) + y,
+                        zip(*chunks[chunk_depths[level + 1]]),
+                    )
+                )
+                break
+
+            yield Pos(n + top, (tx << n) + x, (ty << n) + y)
+        else:
+            stack.pop()
+
+
+# Cleared, read-only tile buffers, keyed by ImageMode. Missing tiles are common
+# in sparse pyramids, so we copy these rather than clearing out a new buffer
+# each time.
+_MASKED_TILE_TEMPLATES = {}
+
+
+def _make_masked_tile(mode):
+    """Create a new, fully masked 256×256 tile image with the specified mode."""
+    template = _MASKED_TILE_TEMPLATES.get(mode)
+
+    if template is None:
+        buf = mode.make_maskable_buffer(256, 256)
+        buf.clear()
+        template = buf.asarray()
+        template.flags.writeable = False
+        _MASKED_TILE_TEMPLATES[mode] = template
+
+    return Image.from_array(template.copy())
+
+
+def _missing_tile(default, masked_mode):
+    """Get the value that ``read_image`` should return for a missing tile."""
+    if default == "none":
+        return None
+    elif default == "masked":
+        if masked_mode is None:
+            raise ValueError('masked_mode should be set if default="masked"')
+        return _make_masked_tile(masked_mode)
+    else:
+        raise ValueError('unexpected value for "default": {!r}'.format(default))
 
 
 def guess_base_layer_level(wcs):
@@ -228,6 +401,15 @@ class PyramidIO(object):
 
         self._base_dir = base_dir
 
+        # Tile paths are built by plain string formatting in the hot loop, so
+        # precompute the base directory with a trailing separator (or an
+        # empty string if the base directory is empty).
+        self._path_prefix = os.path.join(base_dir, "")
+
+        # Directories that we know exist, so that we don't need to issue a
+        # syscall every time we compute a tile path.
+        self._dirs_made = set()
+
         if scheme == "L/Y/YX":
             self._tile_path = self._tile_path_LsYsYX
             self._scheme = "{1}/{3}/{3}_{2}"
@@ -274,27 +456,25 @@ class PyramidIO(object):
         making sure to set ``makedirs = False``.
         """
 
-        level = str(pos.n)
-        ix = str(pos.x)
-        iy = str(pos.y)
-        return self._tile_path(level, ix, iy, format=format, makedirs=makedirs)
+        return self._tile_path(pos, format or self._default_format, makedirs)
 
-    def _tile_path_LsYsYX(self, level, ix, iy, format=None, makedirs=True):
-        d = os.path.join(self._base_dir, level, iy)
-        if makedirs:
+    def _makedirs(self, d):
+        if d not in self._dirs_made:
             os.makedirs(d, exist_ok=True)
-        return os.path.join(
-            d, "{}_{}.{}".format(iy, ix, format or self._default_format)
-        )
+            self._dirs_made.add(d)
 
-    def _tile_path_LXY(self, level, ix, iy, format=None, makedirs=True):
-        if makedirs:
-            os.makedirs(self._base_dir, exist_ok=True)
+    def _tile_path_LsYsYX(self, pos, format, makedirs):
+        n, x, y = pos
+        d = f"{self._path_prefix}{n}{os.sep}{y}"
+        if makedirs and d not in self._dirs_made:
+            self._makedirs(d)
+        return f"{d}{os.sep}{y}_{x}.{format}"
 
-        return os.path.join(
-            self._base_dir,
-            "L{}X{}Y{}.{}".format(level, ix, iy, format or self._default_format),
-        )
+    def _tile_path_LXY(self, pos, format, makedirs):
+        if makedirs and self._base_dir not in self._dirs_made:
+            self._makedirs(self._base_dir)
+        n, x, y = pos
+        return f"{self._path_prefix}L{n}X{x}Y{y}.{format}"
 
     def get_path_scheme(self):
         """Get the scheme for buiding tile paths as used in the WTML standard.
@@ -362,19 +542,76 @@ class PyramidIO(object):
             if e.errno != 2:
                 raise  # not EEXIST
 
-            if default == "none":
-                return None
-            elif default == "masked":
-                if masked_mode is None:
-                    raise ValueError('masked_mode should be set if default="masked"')
-                buf = masked_mode.make_maskable_buffer(256, 256)
-                buf.clear()
-                return buf
-            else:
-                raise ValueError('unexpected value for "default": {!r}'.format(default))
+            return _missing_tile(default, masked_mode)
 
         return img
 
+    def iter_read_images(
+        self, positions, default="none", masked_mode=None, format=None, prefetch=8
+    ):
+        """
+        Read the images for a sequence of tile positions, prefetching them in
+        background threads.
+
+        Parameters
+        ----------
+        positions : iterable of :class:`Pos`
+            The tile positions to read.
+        default : str, defaults to "none"
+            What to do if a tile does not exist. See :meth:`read_image`.
+        masked_mode : :class:`toasty.image.ImageMode`
+            The image data mode to use if ``default`` is set to ``'masked'``.
+        format : :class:`str` or ``None`` (the default)
+            The format name; one of ``SUPPORTED_FORMATS``
+        prefetch : optional int, defaults to 8
+            The maximum number of tiles to read ahead of the consumer. If less
+            than 1, tiles are read serially in the calling thread.
+
+        Yields
+        ------
+        ``(pos, image)`` tuples, in the same order as *positions*, where
+        *image* is the result of :meth:`read_image` for *pos*.
+
+        Notes
+        -----
+        When processing tiles in a predictable order, this hides the latency of
+        the I/O and decoding of each tile behind the processing of its
+        predecessors.
+        """
+        if prefetch < 1:
+            for pos in positions:
+                yield pos, self.read_image(
+                    pos, default=default, masked_mode=masked_mode, format=format
+                )
+            return
+
+        from concurrent.futures import ThreadPoolExecutor
+
+        with ThreadPoolExecutor(max_workers=prefetch) as executor:
+            pending = deque()
+
+            for pos in positions:
+                pending.append(
+                    (
+                        pos,
+                        executor.submit(
+                            self.read_image,
+                            pos,
+                            default=default,
+                            masked_mode=masked_mode,
+                            format=format,
+                        ),
+                    )
+                )
+
+                if len(pending) > prefetch:
+                    pos, future = pending.popleft()
+                    yield pos, future.result()
+
+            while pending:
+                pos, future = pending.popleft()
+                yield pos, future.result()
+
     def write_image(
         self, pos, image, format=None, mode=None, min_value=None, max_value=None
     ):
@@ -456,15 +693,21 @@ class PyramidIO(object):
         work. The "cascade" stage doesn't need locking, so in general only the
         deepest level of the pyramid will need to be cleaned.
         """
-        for x in range(0, 2**level):
-            for y in range(0, 2**level):
-                pos = Pos(level, x, y)
-                p = self.tile_path(pos, makedirs=False) + ".lock"
+        # Rather than trying to remove a lockfile for every one of the
+        # `4**level` tiles, scan for the ones that actually exist.
+        prefix = glob.escape(self._path_prefix)
+        suffix = glob.escape(f".{self._default_format}.lock")
 
-                try:
-                    os.unlink(p)
-                except FileNotFoundError:
-                    pass
+        if self._tile_path == self._tile_path_LXY:
+            pattern = f"{prefix}L{level}X*Y*{suffix}"
+        else:
+            pattern = f"{prefix}{level}{os.sep}*{os.sep}*_*{suffix}"
+
+        for p in glob.iglob(pattern):
+            try:
+                os.unlink(p)
+            except FileNotFoundError:
+                pass
 
     def open_metadata_for_read(self, basename):
         """
@@ -496,15 +739,529 @@ class PyramidIO(object):
         A writable and closeable file-like object accepting bytes.
 
         """
-        # We can't use the `exist_ok` kwarg because it's not available in Python 2.
-        try:
-            os.makedirs(self._base_dir)
-        except OSError as e:
-            if e.errno != 17:
-                raise  # not EEXIST
+        self._makedirs(self._base_dir)
         return open(os.path.join(self._base_dir, basename), "wb")
 
 
+# The name of the file describing a pyramid container.
+_CONTAINER_MANIFEST = "toasty_container.json"
+
+# Records in a pyramid container's index files: tile Y, tile X, slot.
+_CONTAINER_INDEX_DTYPE = np.dtype("<i8")
+_CONTAINER_RECORD_SIZE = 3 * _CONTAINER_INDEX_DTYPE.itemsize
+
+
+class PyramidIOContainer(PyramidIO):
+    """
+    Manage I/O on a tile pyramid stored in single-file containers.
+
+    Parameters
+    ----------
+    base_dir : str
+        The base directory containing the container files
+    dtype : Numpy dtype, defaults to ``np.float32``
+        The data type of the tiles. All tiles in the pyramid must be
+        single-plane 256×256 arrays of this type.
+
+    Notes
+    -----
+    Rather than storing one file per tile, this class stores the tiles of each
+    level *n* of the pyramid in a single data file named ``L{n}.dat``. New tiles
+    are appended to this file as raw 256×256 arrays, so its size is
+    proportional to the number of tiles written, no matter how deep the level
+    is and whether or not the filesystem supports sparse files. A companion
+    append-only index, ``L{n}.idx``, maps tile positions to their slots in the
+    data file: it is a sequence of little-endian int64 triples ``(y, x,
+    slot)``, where later records supersede earlier ones, and a negative slot
+    ``-s - 1`` records that the tile in slot *s* has been deleted. This
+    eliminates the per-tile filesystem overhead of :class:`PyramidIO`, which
+    dominates when processing deep pyramids of numerical data.
+
+    Tiles are stored with ``casting="safe"``, so :meth:`write_image` raises a
+    :exc:`TypeError` for data that can't be converted to the container's data
+    type without loss. For instance, float64 tiles can't be written to the
+    default float32 container; convert them first, or create the container
+    with ``dtype=np.float64``. The data type is recorded in the container when
+    it is created, and opening the container with a different one raises a
+    :exc:`ValueError`.
+
+    Writes to each level are serialized with a lockfile, so different processes
+    can safely write tiles simultaneously, and this class can be used with the
+    parallelized processing in :class:`Pyramid`. Tiles with their own lockfiles
+    (see :meth:`PyramidIO.update_image`) are named as if using the ``LXY``
+    scheme.
+    """
+
+    def __init__(self, base_dir, dtype=np.float32):
+        super(PyramidIOContainer, self).__init__(
+            base_dir, scheme="LXY", default_format="npy"
+        )
+        self._dtype = np.dtype(dtype)
+        self._tile_bytes = 256 * 256 * self._dtype.itemsize
+        self._checked_manifest = False
+
+        # For each level, the known tile slots and how much of the index file
+        # we've read.
+        self._indices = {}
+
+    def _level_path(self, n, extension):
+        return f"{self._path_prefix}L{n}.{extension}"
+
+    def _check_manifest(self, create):
+        """
+        Make sure that the container exists and has our data type. Returns
+        False if the container doesn't exist and *create* is false.
+        """
+        if self._checked_manifest:
+            return True
+
+        path = os.path.join(self._base_dir, _CONTAINER_MANIFEST)
+
+        if not os.path.exists(path):
+            if not create:
+                return False
+
+            from filelock import SoftFileLock
+
+            self._makedirs(self._base_dir)
+
+            with SoftFileLock(path + ".lock"):
+                # Another process may have beaten us to it.
+                if not os.path.exists(path):
+                    tmp_path = path + ".tmp"
+
+                    with open(tmp_path, "wt") as f:
+                        json.dump({"dtype": self._dtype.str}, f)
+
+                    os.rename(tmp_path, path)
+
+        with open(path, "rt") as f:
+            dtype = np.dtype(json.load(f)["dtype"])
+
+        if dtype != self._dtype:
+            raise ValueError(
+                f"pyramid container `{self._base_dir}` has data type {dtype}, "
+                f"but expected {self._dtype}"
+            )
+
+        self._checked_manifest = True
+        return True
+
+    def _read_index(self, n):
+        """
+        Get the mapping from ``(y, x)`` to slot records for level *n*, reading
+        any records appended since we last looked.
+        """
+        index, nread = self._indices.get(n, ({}, 0))
+
+        try:
+            with open(self._level_path(n, "idx"), "rb") as f:
+                f.seek(nread)
+                new = f.read()
+        except FileNotFoundError:
+            return index
+
+        # Another process might be in the middle of appending a record.
+        nrecords = len(new) // _CONTAINER_RECORD_SIZE
+        records = np.frombuffer(
+            new, dtype=_CONTAINER_INDEX_DTYPE, count=3 * nrecords
+        ).reshape((nrecords, 3))
+
+        for y, x, slot in records.tolist():
+            index[y, x] = slot
+
+        self._indices[n] = (index, nread + nrecords * _CONTAINER_RECORD_SIZE)
+        return index
+
+    def read_image(self, pos, default="none", masked_mode=None, format=None):
+        """
+        Read an Image for the specified tile position.
+
+        Parameters
+        ----------
+        pos : :class:`Pos`
+            The tile position to read.
+        default : str, defaults to "none"
+            What to do if the specified tile does not exist. See
+            :meth:`PyramidIO.read_image`.
+        masked_mode : :class:`toasty.image.ImageMode`
+            The image data mode to use if ``default`` is set to ``'masked'``.
+        format : ignored
+            Present for compatibility with :class:`PyramidIO`.
+        """
+        if not self._check_manifest(False):
+            return _missing_tile(default, masked_mode)
+
+        slot = self._read_index(pos.n).get((pos.y, pos.x), -1)
+
+        if slot < 0:
+            return _missing_tile(default, masked_mode)
+
+        with open(self._level_path(pos.n, "dat"), "rb") as f:
+            f.seek(slot * self._tile_bytes)
+            data = np.fromfile(f, dtype=self._dtype, count=256 * 256)
+
+        return Image.from_array(data.reshape((256, 256)))
+
+    def write_image(
+        self, pos, image, format=None, mode=None, min_value=None, max_value=None
+    ):
+        """Write an Image for the specified tile position.
+
+        Parameters
+        ----------
+        pos : :class:`Pos`
+            The tile position to write.
+        image : :class:`toasty.image.Image`
+            The image to write. Its data must be a 256×256 array that can be
+            safely cast to this container's data type.
+        format, mode, min_value, max_value : ignored
+            Present for compatibility with :class:`PyramidIO`.
+
+        Raises
+        ------
+        TypeError
+            If the image data can't be safely cast to the container's data
+            type, such as float64 data in a float32 container.
+        ValueError
+            If the image data are not 256×256.
+        """
+        from filelock import SoftFileLock
+
+        arr = None
+
+        # As with file-based pyramids, fully masked tiles are not stored.
+        if not image.is_completely_masked():
+            arr = image.asarray()
+
+            if arr.shape != (256, 256):
+                raise ValueError(
+                    f"cannot store tile of shape {arr.shape} in a pyramid container"
+                )
+
+            arr = np.ascontiguousarray(
+                arr.astype(self._dtype, casting="safe", copy=False)
+            )
+
+        self._check_manifest(True)
+        key = (pos.y, pos.x)
+        data_path = self._level_path(pos.n, "dat")
+        index_path = self._level_path(pos.n, "idx")
+
+        with SoftFileLock(index_path + ".lock"):
+            record = self._read_index(pos.n).get(key)
+
+            if arr is None:
+                if record is None or record < 0:
+                    return  # Nothing to delete.
+
+                new_record = -record - 1
+            else:
+                if record is None:
+                    # Append a new tile to the data file. Round up, in case a
+                    # previous write was interrupted partway through.
+                    try:
+                        slot = -(-os.path.getsize(data_path) // self._tile_bytes)
+                    except FileNotFoundError:
+                        slot = 0
+                elif record < 0:
+                    slot = -record - 1  # Reuse the slot of a deleted tile.
+                else:
+                    slot = record  # Overwrite the existing tile.
+
+                fd = os.open(data_path, os.O_RDWR | os.O_CREAT, 0o666)
+
+                with os.fdopen(fd, "r+b") as f:
+                    f.seek(slot * self._tile_bytes)
+                    f.write(arr.data)
+
+                new_record = slot
+
+            # Write the index record after the data, so that readers never see
+            # an index entry for a tile that hasn't been written.
+            if new_record != record:
+                with open(index_path, "ab") as f:
+                    f.write(
+                        np.array(
+                            [pos.y, pos.x, new_record], dtype=_CONTAINER_INDEX_DTYPE
+                        ).tobytes()
+                    )
+
+
+# The name of the file describing the layout of a sharded pyramid.
+_SHARD_MANIFEST = "toasty_shards.json"
+
+
+def _shard_geometry(pos, shard_bits):
+    """
+    Get the shard coordinates of a tile, and its index within the shard.
+
+    Returns ``(sx, sy, side, index)``, where *side* is the number of tiles
+    along each side of the shard.
+    """
+    bits = min(pos.n, shard_bits)
+    mask = (1 << bits) - 1
+    side = 1 << bits
+    index = (pos.y & mask) * side + (pos.x & mask)
+    return pos.x >> bits, pos.y >> bits, side, index
+
+
+def _shard_path(base_dir, n, sx, sy):
+    return os.path.join(base_dir, f"{n}{os.sep}{sy}_{sx}.zst")
+
+
+def pack_sharded_pyramid(
+    pio, base_dir, depth, shard_bits=3, compression_level=3, cli_progress=False
+):
+    """Pack the tiles of a pyramid into Zstandard-compressed shards.
+
+    Parameters
+    ----------
+    pio : :class:`PyramidIO`
+        The file-per-tile pyramid to pack.
+    base_dir : str
+        The base directory of the sharded pyramid to create.
+    depth : int
+        The depth of the pyramid.
+    shard_bits : optional int, defaults to 3
+        Each shard will contain a square block of ``2**shard_bits`` tiles on a
+        side. The default packs 8×8 tiles per shard.
+    compression_level : optional int, defaults to 3
+        The Zstandard compression level.
+    cli_progress : optional boolean, defaults False
+        If true, a progress bar will be printed to the terminal.
+
+    Notes
+    -----
+    The tile files are packed as-is, so the tile format of the sharded pyramid
+    is the default format of *pio*. Only Numpy and PIL-compatible formats are
+    supported. Metadata files are not copied.
+
+    This function requires the `zstandard`_ package.
+
+    .. _zstandard: https://python-zstandard.readthedocs.io/
+    """
+    import zstandard
+
+    format = pio.get_default_format()
+
+    if format == "fits":
+        raise ValueError("FITS tiles cannot be packed into a sharded pyramid")
+
+    compressor = zstandard.ZstdCompressor(level=compression_level)
+    os.makedirs(base_dir, exist_ok=True)
+
+    with progress_bar(total=depth + 1, show=cli_progress) as progress:
+        for n in range(depth + 1):
+            bits = min(n, shard_bits)
+            side = 1 << bits
+
+            for sy in range(1 << (n - bits)):
+                for sx in range(1 << (n - bits)):
+                    offsets = np.zeros(side * side + 1, dtype="<u8")
+                    blobs = []
+
+                    for iy in range(side):
+                        for ix in range(side):
+                            pos = Pos(n, (sx << bits) + ix, (sy << bits) + iy)
+                            p = pio.tile_path(pos, makedirs=False)
+
+                            try:
+                                with open(p, "rb") as f:
+                                    blobs.append(f.read())
+                            except FileNotFoundError:
+                                blobs.append(b"")
+
+                    if not any(blobs):
+                        continue
+
+                    offsets[1:] = np.cumsum([len(b) for b in blobs])
+                    p = _shard_path(base_dir, n, sx, sy)
+                    os.makedirs(os.path.dirname(p), exist_ok=True)
+
+                    with open(p, "wb") as f:
+                        f.write(
+                            compressor.compress(offsets.tobytes() + b"".join(blobs))
+                        )
+
+            progress.update(1)
+
+    with open(os.path.join(base_dir, _SHARD_MANIFEST), "wt") as f:
+        json.dump({"format": format, "shard_bits": shard_bits}, f)
+
+
+class ShardedPyramidIO(PyramidIO):
+    """
+    Read tiles from a pyramid packed into Zstandard-compressed shards.
+
+    Parameters
+    ----------
+    base_dir : str
+        The base directory of the sharded pyramid, as created by
+        :func:`pack_sharded_pyramid`.
+    cache_size : optional int, defaults to 16
+        The number of decompressed shards to keep in memory.
+
+    Notes
+    -----
+    Each shard packs a square block of tiles at one level of the pyramid into
+    a single compressed file, so that reading many neighboring tiles from slow
+    storage requires only a few large reads. Shards are decompressed on demand
+    and the most recently used ones are cached.
+
+    Sharded pyramids are read-only: :meth:`write_image`, :meth:`update_image`,
+    :meth:`clean_lockfiles`, :meth:`open_metadata_for_write`, and
+    :meth:`tile_path` all raise :exc:`PermissionError`. To modify a sharded
+    pyramid, write a regular one with :class:`PyramidIO` and pack it again
+    with :func:`pack_sharded_pyramid`. This class requires the `zstandard`_
+    package.
+
+    .. _zstandard: https://python-zstandard.readthedocs.io/
+    """
+
+    def __init__(self, base_dir, cache_size=16):
+        import zstandard
+
+        with open(os.path.join(base_dir, _SHARD_MANIFEST), "rt") as f:
+            manifest = json.load(f)
+
+        super(ShardedPyramidIO, self).__init__(
+            base_dir, default_format=manifest["format"]
+        )
+        self._shard_bits = manifest["shard_bits"]
+        self._decompressor = zstandard.ZstdDecompressor()
+        self._cache_size = cache_size
+        self._shards = OrderedDict()
+
+        # The shard cache and the decompressor may not be used by multiple
+        # threads at once; see `iter_read_images()`.
+        self._lock = threading.Lock()
+
+    def _get_shard(self, n, sx, sy, side):
+        """
+        Get the ``(offsets, payload)`` of a shard, or None if it doesn't exist.
+        """
+        key = (n, sx, sy)
+
+        try:
+            self._shards.move_to_end(key)
+            return self._shards[key]
+        except KeyError:
+            pass
+
+        try:
+            with open(_shard_path(self._base_dir, n, sx, sy), "rb") as f:
+                data = self._decompressor.decompress(f.read())
+        except FileNotFoundError:
+            shard = None
+        else:
+            noffsets = side * side + 1
+            offsets = np.frombuffer(data, dtype="<u8", count=noffsets)
+            shard = (offsets, memoryview(data)[8 * noffsets :])
+
+        self._shards[key] = shard
+
+        if len(self._shards) > self._cache_size:
+            self._shards.popitem(last=False)
+
+        return shard
+
+    def read_image(self, pos, default="none", masked_mode=None, format=None):
+        """
+        Read an Image for the specified tile position.
+
+        Parameters
+        ----------
+        pos : :class:`Pos`
+            The tile position to read.
+        default : str, defaults to "none"
+            What to do if the specified tile does not exist. See
+            :meth:`PyramidIO.read_image`.
+        masked_mode : :class:`toasty.image.ImageMode`
+            The image data mode to use if ``default`` is set to ``'masked'``.
+        format : ignored
+            Present for compatibility with :class:`PyramidIO`.
+        """
+        sx, sy, side, index = _shard_geometry(pos, self._shard_bits)
+
+        with self._lock:
+            shard = self._get_shard(pos.n, sx, sy, side)
+
+        if shard is None:
+            return _missing_tile(default, masked_mode)
+
+        offsets, payload = shard
+        start, end = offsets[index], offsets[index + 1]
+
+        if start == end:
+            return _missing_tile(default, masked_mode)
+
+        stream = io.BytesIO(payload[start:end])
+
+        if self._default_format == "npy":
+            return Image.from_array(np.load(stream), default_format="npy")
+
+        return ImageLoader().load_stream(stream)
+
+    def _read_only(self):
+        return PermissionError(
+            f"sharded pyramid `{self._base_dir}` is read-only; tiles cannot be "
+            "written or addressed as individual files"
+        )
+
+    def tile_path(self, pos, format=None, makedirs=True):
+        """Not available: tiles in a sharded pyramid are not individual files.
+
+        Raises
+        ------
+        PermissionError
+            Always.
+        """
+        raise self._read_only()
+
+    def write_image(
+        self, pos, image, format=None, mode=None, min_value=None, max_value=None
+    ):
+        """Not available: sharded pyramids are read-only.
+
+        Raises
+        ------
+        PermissionError
+            Always.
+        """
+        raise self._read_only()
+
+    def update_image(self, pos, default="none", masked_mode=None, format=None):
+        """Not available: sharded pyramids are read-only.
+
+        Raises
+        ------
+        PermissionError
+            Always.
+        """
+        raise self._read_only()
+
+    def clean_lockfiles(self, level):
+        """Not available: sharded pyramids are read-only.
+
+        Raises
+        ------
+        PermissionError
+            Always.
+        """
+        raise self._read_only()
+
+    def open_metadata_for_write(self, basename):
+        """Not available: sharded pyramids are read-only.
+
+        Raises
+        ------
+        PermissionError
+            Always.
+        """
+        raise self._read_only()
+
+
 class Pyramid(object):
     """An object representing a tile pyramid.
 
@@ -898,24 +1655,31 @@ class Pyramid(object):
             self._walk_serial(callback, cli_progress)
 
     def _walk_serial(self, callback, cli_progress):
-        if self.depth > 9 and self._tile_filter is not None:
-            # This is around where there are enough tiles that the prep stage
-            # might take a noticeable amount of time.
-            print("Counting tiles ...")
-            t0 = time.time()
+        # With a tile filter, counting the operations takes a complete extra
+        # pass over the pyramid, so we only do it if we need a progress bar.
 
-        total = self.count_operations()
+        total = None
 
-        if self.depth > 9 and self._tile_filter is not None:
-            print(f"... {time.time() - t0:.1f}s elapsed")
+        if cli_progress or self._tile_filter is None:
+            if self.depth > 9 and self._tile_filter is not None:
+                # This is around where there are enough tiles that the prep stage
+                # might take a noticeable amount of time.
+                print("Counting tiles ...")
+                t0 = time.time()
 
-        if total == 0:
-            print("- Nothing to do.")
-            return
+            total = self.count_operations()
+
+            if self.depth > 9 and self._tile_filter is not None:
+                print(f"... {time.time() - t0:.1f}s elapsed")
+
+            if total == 0:
+                print("- Nothing to do.")
+                return
 
         # In serial mode, we can do actual processing as another reduction:
 
         riter = self._make_iter_reducer(default_value=False)
+        n_done = 0
 
         with progress_bar(total=total, show=cli_progress) as progress:
             for pos, _tile, is_leaf, data in riter:
@@ -927,9 +1691,13 @@ class Pyramid(object):
                     if is_live:
                         callback(pos)
                         progress.update(1)
+                        n_done += 1
 
                 riter.set_data(is_live)
 
+        if n_done == 0:
+            print("- Nothing to do.")
+
     def _walk_parallel(self, callback, cli_progress, parallel):
         import multiprocessing as mp
         from queue import Empty
@@ -982,7 +1750,7 @@ class Pyramid(object):
                         pre_readied |= 1 << i
 
                 if pre_readied:
-                    readiness[pos] = pre_readied
+                    readiness[_pos_key(*pos)] = pre_readied
 
             # Seeding ready queue
 
@@ -1043,18 +1811,18 @@ class Pyramid(object):
 
                 # If this tile was finished, its parent is one step
                 # closer to being ready to process.
-                ppos, x_index, y_index = pos_parent(pos)
-                bit_num = 2 * y_index + x_index
-                flags = readiness.get(ppos, 0)
-                flags |= 1 << bit_num
+                n, x, y = pos
+                pkey = _pos_key(n - 1, x >> 1, y >> 1)
+                flags = readiness.get(pkey, 0)
+                flags |= 1 << (2 * (y & 1) + (x & 1))
 
                 # If this tile was the last of its siblings to be finished,
                 # the parent is now ready for processing.
                 if flags == 0xF:
-                    readiness.pop(ppos)
-                    ready_queue.put(ppos)
+                    readiness.pop(pkey)
+                    ready_queue.put(Pos(n - 1, x >> 1, y >> 1))
                 else:
-                    readiness[ppos] = flags
+                    readiness[pkey] = flags
 
         # All done!
 
@@ -1070,6 +1838,7 @@ class Pyramid(object):
         callback,
         parallel=None,
         cli_progress=False,
+        flush=None,
     ):
         """Traverse the pyramid, calling the callback for each
         leaf tile.
@@ -1086,6 +1855,13 @@ class Pyramid(object):
             processing will be forced. Pass ``1`` to force serial processing.
         cli_progress : optional boolean, defaults False
             If true, a progress bar will be printed to the terminal.
+        flush : optional function() -> None
+            If specified, this function will be called whenever the callbacks
+            made so far must have completed their work: in each worker process
+            after it finishes each subpyramid shard of leaves, and at the end
+            of the visit in the serial case. It is called even if a callback
+            raises an exception. Use this if the callback defers some of its
+            work, for instance to a background thread.
 
         Returns
         -------
@@ -1121,46 +1897,91 @@ class Pyramid(object):
         # Unlike walk(), where the parallel case needs some extra logic to
         # maintain our ordering guarantees, the serial and parallel cases here
         # are pretty similar, so we can reuse more code. First, assess the
-        # amount of work to do.
+        # amount of work to do. With a tile filter, this takes a complete extra
+        # pass over the pyramid, so we only do it if we need a progress bar.
 
-        if self.depth > 9 and self._tile_filter is not None:
-            # This is around where there are enough tiles that the prep stage
-            # might take a noticeable amount of time.
-            print("Counting tiles ...")
-            t0 = time.time()
+        total = None
 
-        total = self.count_leaf_tiles()
+        if cli_progress or self._tile_filter is None:
+            if self.depth > 9 and self._tile_filter is not None:
+                # This is around where there are enough tiles that the prep stage
+                # might take a noticeable amount of time.
+                print("Counting tiles ...")
+                t0 = time.time()
 
-        if self.depth > 9 and self._tile_filter is not None:
-            print(f"... {time.time() - t0:.1f}s elapsed")
+            total = self.count_leaf_tiles()
 
-        if total == 0:
-            print("- Nothing to do.")
-            return
+            if self.depth > 9 and self._tile_filter is not None:
+                print(f"... {time.time() - t0:.1f}s elapsed")
+
+            if total == 0:
+                print("- Nothing to do.")
+                return
 
         # Now the meat of it.
 
         if parallel > 1:
-            self._visit_leaves_parallel(callback, total, cli_progress, parallel)
+            n_done = self._visit_leaves_parallel(
+                callback, total, cli_progress, parallel, flush
+            )
         else:
-            self._visit_leaves_serial(callback, total, cli_progress)
+            n_done = self._visit_leaves_serial(callback, total, cli_progress, flush)
+
+        if n_done == 0:
+            print("- Nothing to do.")
 
-    def _visit_leaves_serial(self, callback, total, cli_progress):
+    def _visit_leaves_serial(self, callback, total, cli_progress, flush):
         riter = self._make_iter_reducer()
+        n_done = 0
 
-        with progress_bar(total=total, show=cli_progress) as progress:
-            for pos, tile, is_leaf, _data in riter:
-                if is_leaf:
-                    callback(pos, tile)
-                    progress.update(1)
+        try:
+            with progress_bar(total=total, show=cli_progress) as progress:
+                for pos, tile, is_leaf, _data in riter:
+                    if is_leaf:
+                        callback(pos, tile)
+                        progress.update(1)
+                        n_done += 1
 
-                riter.set_data(None)
+                    riter.set_data(None)
+        finally:
+            # Even if a callback failed, deferred work must finish, and its
+            # errors must not be lost.
+            if flush is not None:
+                flush()
+
+        return n_done
 
-    def _visit_leaves_parallel(self, callback, total, cli_progress, parallel):
+    def _visit_leaves_parallel(self, callback, total, cli_progress, parallel, flush):
         import multiprocessing as mp
+        from queue import Empty
 
-        ready_queue = mp.Queue(maxsize=2 * parallel)
-        done_event = mp.Event()
+        # Rather than generating every leaf tile in this process and shipping
+        # them off to the workers, we hand out entire subpyramids ("shards")
+        # and let each worker compute its own tiles. Choose a shard level that
+        # gives us enough shards to keep all of the workers busy even if the
+        # shards end up with very different amounts of work.
+
+        shard_level = self._apex.n
+
+        while (
+            shard_level < self.depth
+            and tiles_at_depth(shard_level - self._apex.n)
+            < _VISIT_SHARDS_PER_WORKER * parallel
+        ):
+            shard_level += 1
+
+        shallow = copy.copy(self)
+        shallow.depth = shard_level
+        shards = [pos for pos, _tile in shallow._generator() if pos.n == shard_level]
+
+        shard_queue = mp.Queue()
+        done_queue = mp.Queue()
+
+        for shard in shards:
+            shard_queue.put(shard)
+
+        for _ in range(parallel):
+            shard_queue.put(None)
 
         # Create workers:
 
@@ -1169,33 +1990,52 @@ class Pyramid(object):
         for _ in range(parallel):
             w = mp.Process(
                 target=_mp_visit_worker,
-                args=(ready_queue, done_event, callback),
+                args=(self, shard_queue, done_queue, callback, flush),
             )
             w.daemon = True
             w.start()
             workers.append(w)
 
-        # Dispatch:
+        # Wait for the shards to finish, keeping tabs on progress. If a worker
+        # crashes, its shard will never be finished, so we need to check up on
+        # them to avoid hanging. Workers flush their reports before exiting, so
+        # if they were all dead before we started waiting, nothing is coming.
 
-        riter = self._make_iter_reducer()
+        n_unfinished = len(shards)
+        n_done = 0
 
         with progress_bar(total=total, show=cli_progress) as progress:
-            for pos, tile, is_leaf, _data in riter:
-                if is_leaf:
-                    ready_queue.put((pos, tile))
-                    progress.update(1)
+            while n_unfinished:
+                any_alive = any(w.is_alive() for w in workers)
 
-                riter.set_data(None)
+                try:
+                    count, finished = done_queue.get(True, timeout=1)
+                except Empty:
+                    if not any_alive:
+                        raise Exception("leaf-visiting worker processes have died")
+                    continue
 
-        # All done!
+                progress.update(count)
+                n_done += count
 
-        ready_queue.close()
-        ready_queue.join_thread()
-        done_event.set()
+                if finished:
+                    n_unfinished -= 1
+
+        # All done!
 
         for w in workers:
             w.join()
 
+        return n_done
+
+    def _shard(self, apex):
+        """Return a copy of this pyramid that only visits the subpyramid rooted
+        at *apex*, which must be a descendant of this pyramid's apex."""
+
+        inst = copy.copy(self)
+        inst._apex = Pyramid._apex
+        return inst.subpyramid(apex)
+
 
 class PyramidReductionIterator(object):
     """Non-public helper class for a performing a "reduction iteration" over a
@@ -1256,11 +2096,14 @@ class PyramidReductionIterator(object):
         # reverse it.
 
         new_levels = []
-        ipos = pos
+        d = self._d
+        n, x, y = pos
 
-        while ipos.n >= n_before:
-            new_levels.append([ipos.x, ipos.y, self._d, self._d, self._d, self._d])
-            ipos = pos_parent(ipos)[0]
+        while n >= n_before:
+            new_levels.append([x, y, d, d, d, d])
+            n -= 1
+            x >>= 1
+            y >>= 1
 
         self._levels += new_levels[::-1]
 
@@ -1331,11 +2174,13 @@ class PyramidReductionIterator(object):
             self._final_result = value
         else:
             # Otherwise, log this result in the appropriate entry for this
-            # tile's parent.
-            ppos, ix, iy = pos_parent(self._most_recent_pos)
-            assert self._levels[ppos.n][0] == ppos.x
-            assert self._levels[ppos.n][1] == ppos.y
-            self._levels[ppos.n][2 + 2 * iy + ix] = value
+            # tile's parent. This is called for every tile in the pyramid, so
+            # we avoid creating a parent Pos.
+            n, x, y = self._most_recent_pos
+            level = self._levels[n - 1]
+            assert level[0] == x >> 1
+            assert level[1] == y >> 1
+            level[2 + 2 * (y & 1) + (x & 1)] = value
 
         self._got_data = True
 
@@ -1348,6 +2193,16 @@ class PyramidReductionIterator(object):
         return self._final_result
 
 
+def _pos_key(n, x, y):
+    """
+    Pack a tile position into a single integer, for use as a dictionary key.
+    Integers hash much faster than :class:`Pos` tuples and take up less memory
+    when we're tracking millions of tiles. This is unique as long as *x* and *y*
+    fit in 29 bits, which is far deeper than any pyramid we'll ever build.
+    """
+    return (n << 58) | (y << 29) | x
+
+
 def _make_position_filter(apex):
     """
     A simple pyramid filter that only accepts positions leading up to a
@@ -1360,22 +2215,19 @@ def _make_position_filter(apex):
     visit will be such descendants, so we can get away with it.
     """
 
-    level = apex.n
-    parent_positions = set()
-
-    while True:
-        parent_positions.add(apex)
-
-        if apex.n == 0:
-            break
-
-        apex = pos_parent(apex)[0]
+    # This is called for every tile visited, so we avoid attribute lookups and
+    # allocations. A position at or above the apex level leads up to it if
+    # shifting the apex indices up to that level gives the position's.
+    level, apex_x, apex_y = apex
 
     def position_filter(pos):
-        if pos.n > level:
+        n, x, y = pos
+
+        if n > level:
             return True
 
-        return pos in parent_positions
+        shift = level - n
+        return (apex_x >> shift) == x and (apex_y >> shift) == y
 
     return position_filter
 
@@ -1398,18 +2250,45 @@ def _mp_walk_worker(done_queue, ready_queue, done_event, callback):
         done_queue.put(pos)
 
 
-def _mp_visit_worker(ready_queue, done_event, callback):
+# The minimum number of leaf-visiting shards to create for each worker
+# process, and the maximum number of leaves a worker visits between progress
+# reports.
+_VISIT_SHARDS_PER_WORKER = 16
+_VISIT_MAX_PROGRESS_INTERVAL = 1024
+
+
+def _mp_visit_worker(pyramid, shard_queue, done_queue, callback, flush):
     """
-    Process tiles that are ready.
+    Visit the leaves of pyramid shards until told to stop.
     """
-    from queue import Empty
+    # Progress reports are sent after 1, 2, 4, ... leaves, so that the progress
+    # bar starts moving right away but big jobs don't flood the queue.
+    interval = 1
 
     while True:
+        apex = shard_queue.get()
+        if apex is None:
+            break
+
+        count = 0
+        riter = pyramid._shard(apex)._make_iter_reducer()
+
+        # Don't report the shard as finished until its work is really done. As
+        # in the serial case, flush even if a callback failed.
         try:
-            args = ready_queue.get(True, timeout=1)
-        except Empty:
-            if done_event.is_set():
-                break
-            continue
+            for pos, tile, is_leaf, _data in riter:
+                if is_leaf:
+                    callback(pos, tile)
+                    count += 1
+
+                    if count >= interval:
+                        done_queue.put((count, False))
+                        count = 0
+                        interval = min(2 * interval, _VISIT_MAX_PROGRESS_INTERVAL)
+
+                riter.set_data(None)
+        finally:
+            if flush is not None:
+                flush()
 
-        callback(*args)
+        done_queue.put((count, True))
@@ -19,6 +19,7 @@ color information: one standard is for *data* to have a dtype of
 RGB colors.
 
 """
+
 from __future__ import absolute_import, division, print_function
 
 __all__ = """
@@ -40,6 +41,48 @@ TWOPI = 2 * np.pi
 HALFPI = 0.5 * np.pi
 
 
+def _frame_rotator(frame):
+    """Create a function that converts ICRS coordinates to another frame.
+
+    Parameters
+    ----------
+    frame : :class:`astropy.coordinates.BaseCoordinateFrame`
+        The destination frame. The transformation from ICRS to it must be a
+        pure rotation, as is the case for Galactic and barycentric ecliptic
+        coordinates.
+
+    Returns
+    -------
+    A function with the call signature ``rotate(lon, lat) -> (lon, lat)``,
+    where the inputs are ICRS coordinates in radians and the outputs are the
+    corresponding coordinates in *frame*, also in radians.
+
+    Notes
+    -----
+    Astropy's frame machinery has a substantial cost per call, so we use it
+    once to find the rotation matrix and then apply that matrix with plain
+    numpy arithmetic.
+
+    """
+    from astropy.coordinates import CartesianRepresentation, ICRS
+
+    basis = ICRS(CartesianRepresentation(np.eye(3), copy=False))
+    matrix = basis.transform_to(frame).cartesian.xyz.value
+
+    def rotate(lon, lat):
+        clat = np.cos(lat)
+        x = clat * np.cos(lon)
+        y = clat * np.sin(lon)
+        z = np.sin(lat)
+
+        rx = matrix[0, 0] * x + matrix[0, 1] * y + matrix[0, 2] * z
+        ry = matrix[1, 0] * x + matrix[1, 1] * y + matrix[1, 2] * z
+        rz = matrix[2, 0] * x + matrix[2, 1] * y + matrix[2, 2] * z
+        return np.arctan2(ry, rx) % TWOPI, np.arctan2(rz, np.hypot(rx, ry))
+
+    return rotate
+
+
 def healpix_sampler(data, nest=False, coord="C", interpolation="nearest"):
     """Create a sampler for HEALPix image data.
 
@@ -64,8 +107,6 @@ def healpix_sampler(data, nest=False, coord="C", interpolation="nearest"):
 
     """
     from healpy import ang2pix, get_interp_val, npix2nside
-    from astropy.coordinates import Galactic, ICRS
-    import astropy.units as u
 
     interp_opts = ["nearest", "bilinear"]
     if interpolation not in interp_opts:
@@ -75,15 +116,19 @@ def healpix_sampler(data, nest=False, coord="C", interpolation="nearest"):
     if coord.upper() not in "CG":
         raise ValueError("Invalid coord %s. Must be 'C' or 'G'" % coord)
 
-    galactic = coord.upper() == "G"
+    if coord.upper() == "G":
+        from astropy.coordinates import Galactic
+
+        to_galactic = _frame_rotator(Galactic())
+    else:
+        to_galactic = None
+
     interp = interpolation == "bilinear"
     nside = npix2nside(data.size)
 
     def vec2pix(l, b):
-        if galactic:
-            f = ICRS(l * u.rad, b * u.rad)
-            g = f.transform_to(Galactic())
-            l, b = g.l.rad, g.b.rad
+        if to_galactic is not None:
+            l, b = to_galactic(l, b)
 
         theta = np.pi / 2 - b
         phi = l
@@ -228,9 +273,9 @@ def plate_carree_galactic_sampler(data):
     *lon* and *lat* are in radians.
 
     """
-    from astropy.coordinates import Galactic, ICRS
-    import astropy.units as u
+    from astropy.coordinates import Galactic
 
+    to_galactic = _frame_rotator(Galactic())
     data = np.asarray(data)
     ny, nx = data.shape[:2]
 
@@ -240,8 +285,7 @@ def plate_carree_galactic_sampler(data):
     lat0 = HALFPI - 0.5 / dy  # latitudes of the centers of the pixels with iy = 0
 
     def vec2pix(lon, lat):
-        gal = ICRS(lon * u.rad, lat * u.rad).transform_to(Galactic)
-        lon, lat = gal.l.rad, gal.b.rad
+        lon, lat = to_galactic(lon, lat)
 
         lon = (lon + np.pi) % TWOPI - np.pi  # ensure in range [-pi, pi]
         ix = (lon0 - lon) * dx
@@ -274,9 +318,9 @@ def plate_carree_ecliptic_sampler(data):
     *lon* and *lat* are in radians.
 
     """
-    from astropy.coordinates import BarycentricTrueEcliptic as Ecliptic, ICRS
-    import astropy.units as u
+    from astropy.coordinates import BarycentricTrueEcliptic as Ecliptic
 
+    to_ecliptic = _frame_rotator(Ecliptic())
     data = np.asarray(data)
     ny, nx = data.shape[:2]
 
@@ -286,8 +330,7 @@ def plate_carree_ecliptic_sampler(data):
     lat0 = HALFPI - 0.5 / dy  # latitudes of the centers of the pixels with iy = 0
 
     def vec2pix(lon, lat):
-        ecl = ICRS(lon * u.rad, lat * u.rad).transform_to(Ecliptic())
-        lon, lat = ecl.lon.rad, ecl.lat.rad
+        lon, lat = to_ecliptic(lon, lat)
         lon = lon % TWOPI - np.pi  # ensure in range [-pi, pi]
 
         ix = (lon0 - lon) * dx
@@ -723,7 +766,9 @@ def _latlon_tile_filter(image_lon_min, image_lon_max, image_lat_min, image_lat_m
     from ._libtoasty import tile_intersects_latlon_bbox
 
     def latlon_tile_filter(tile):
-        corner_lonlats = np.asarray(tile.corners)
+        # This is a no-op for the float64 corner arrays that the TOAST
+        # generators produce.
+        corner_lonlats = np.asarray(tile.corners, dtype=np.float64)
         return tile_intersects_latlon_bbox(
             corner_lonlats, image_lon_min, image_lon_max, image_lat_min, image_lat_max
         )
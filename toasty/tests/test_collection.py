@@ -34,3 +34,102 @@ class TestCollection(object):
             [mk_test_path("wcs512.fits.gz"), mk_test_path("herschel_spire.fits.gz")]
         )
         assert not coll._is_multi_tan()
+
+    @pytest.mark.skipif("not HAS_ASTRO")
+    def test_descriptions_match_images(self):
+        paths = [mk_test_path("wcs512.fits.gz"), mk_test_path("herschel_spire.fits.gz")]
+        coll = collection.SimpleFitsCollection(paths)
+
+        for desc, img in zip(coll.descriptions(), coll.images()):
+            assert desc.collection_id == img.collection_id
+            assert desc.shape == img.shape
+            assert desc.mode == img.mode
+            assert desc.wcs.to_header_string() == img.wcs.to_header_string()
+
+    @pytest.mark.skipif("not HAS_ASTRO")
+    def test_extra_axes(self, tmp_path):
+        import numpy as np
+
+        hdu = fits.PrimaryHDU(np.zeros((2, 5, 4), dtype=np.float32))
+        hdu.header.update(
+            CTYPE1="RA---TAN",
+            CTYPE2="DEC--TAN",
+            CTYPE3="FREQ",
+            CRVAL1=10.0,
+            CRVAL2=20.0,
+            CRVAL3=1e9,
+            CDELT1=-0.01,
+            CDELT2=0.01,
+            CDELT3=1e6,
+        )
+        path = str(tmp_path / "cube.fits")
+        hdu.writeto(path)
+
+        coll = collection.SimpleFitsCollection([path])
+
+        with pytest.warns(UserWarning, match="non-celestial axis"):
+            (desc,) = coll.descriptions()
+        with pytest.warns(UserWarning, match="non-celestial axis"):
+            (img,) = coll.images()
+
+        assert desc.shape == img.shape == (5, 4)
+        assert desc.wcs.naxis == img.wcs.naxis == 2
+
+
+def test_parse_datasec():
+    from ..collection import _parse_datasec
+
+    assert _parse_datasec("[3:28,5:36]") == (slice(4, 36), slice(2, 28))
+    assert _parse_datasec(" [ 1:2 , 3:4 ] ") == (slice(2, 4), slice(0, 2))
+    assert _parse_datasec("[28:3,5:36]") is None
+    assert _parse_datasec("[*,5:36]") is None
+
+
+@pytest.mark.skipif("not HAS_ASTRO")
+def test_rubin_directory_parallel(tmp_path):
+    import numpy as np
+
+    for ifile in range(5):
+        hdus = [fits.PrimaryHDU()]
+
+        for ihdu in range(3):
+            data = np.full((6, 8), 10 * ifile + ihdu, dtype=np.int16)
+            hdu = fits.ImageHDU(data)
+            hdu.header.update(
+                DATASEC="[2:7,2:5]",
+                CTYPE1="RA---TAN",
+                CTYPE2="DEC--TAN",
+                CRVAL1=10.0 + ifile,
+                CRVAL2=20.0,
+                CRPIX1=4.0,
+                CRPIX2=3.0,
+                CDELT1=-0.01,
+                CDELT2=0.01,
+            )
+            hdus.append(hdu)
+
+        fits.HDUList(hdus).writeto(str(tmp_path / f"f{ifile}.fits"))
+
+    def values(coll):
+        return [(img.collection_id, img.asarray()[0, 0]) for img in coll.images()]
+
+    serial = values(collection.RubinDirectoryCollection(str(tmp_path)))
+    assert [v for _, v in serial] == [10 * f + h for f in range(5) for h in range(3)]
+
+    for parallel in (2, 3, 8):
+        coll = collection.RubinDirectoryCollection(str(tmp_path), parallel=parallel)
+        assert values(coll) == serial
+
+        descs = list(coll.descriptions())
+        assert [d.shape for d in descs] == [(4, 6)] * 15
+
+        # Abandoning the iteration partway through must not hang.
+        it = coll.images()
+        next(it)
+        it.close()
+
+    # Errors in the reader threads are propagated.
+    (tmp_path / "f2.fits").write_bytes(b"not a FITS file")
+
+    with pytest.raises(OSError):
+        values(collection.RubinDirectoryCollection(str(tmp_path), parallel=2))
@@ -15,6 +15,18 @@ def test_averaging_merger():
     t = np.array([[np.nan, 1], [3, np.nan]])
     nt.assert_almost_equal(merge.averaging_merger(t), [[2.0]])
 
+    # The 8-bit fast path should truncate like the floating-point path.
+    t = np.array([[[255, 0, 1], [255, 1, 2]], [[255, 1, 3], [254, 1, 3]]], np.uint8)
+    m = merge.averaging_merger(t)
+    assert m.dtype == np.uint8
+    nt.assert_array_equal(m, [[[254, 0, 2]]])
+
+    # Signed integer means should truncate towards zero, too.
+    t = np.array([[-1, -2, 5, 32767], [-1, -1, 32767, 32767]], np.int16)
+    m = merge.averaging_merger(t)
+    assert m.dtype == np.int16
+    nt.assert_array_equal(m, [[-1, 24576]])
+
 
 class TestCascade(object):
     def setup_method(self, method):
@@ -30,6 +42,61 @@ class TestCascade(object):
     def work_path(self, *pieces):
         return os.path.join(self.work_dir, *pieces)
 
+    def test_tile_merger_quadrants(self):
+        """The averaging merger takes a per-quadrant shortcut; it should agree
+        with merging the full-resolution mosaic, including for missing
+        children.
+
+        """
+        from ..image import Image
+        from ..pyramid import Pos, PyramidIO
+
+        parent = Pos(1, 0, 0)
+        children = [Pos(2, 0, 0), Pos(2, 1, 0), Pos(2, 1, 1)]
+
+        results = []
+
+        for tag, merger in (
+            ("quad", merge.averaging_merger),
+            ("mosaic", lambda data: merge.averaging_merger(data)),
+        ):
+            for fmt in ("npy", "fits"):
+                rng = np.random.default_rng(0)
+                pio = PyramidIO(self.work_path(tag + fmt), default_format=fmt)
+
+                for pos in children:
+                    data = rng.random((256, 256)).astype(np.float32)
+                    data[data < 0.2] = np.nan
+                    pio.write_image(pos, Image.from_array(data))
+
+                merge.TileMerger(pio, merger).walk_callback(parent)
+                results.append(pio.read_image(parent).asarray())
+
+        quad_npy, quad_fits, mosaic_npy, mosaic_fits = results
+        nt.assert_array_equal(quad_npy, mosaic_npy)
+        nt.assert_array_equal(quad_fits, mosaic_fits)
+        assert np.isnan(quad_npy[128:, :128]).all()
+        assert not np.isnan(quad_npy[:128, :128]).all()
+
+        # Down to the bit patterns of the NaNs in the missing quadrant:
+        nt.assert_array_equal(quad_npy.view(np.uint32), mosaic_npy.view(np.uint32))
+
+    def test_tile_merger_quadrants_not_aliased(self):
+        """Merged tiles must not be overwritten by later merges."""
+        from ..image import Image
+        from ..pyramid import PyramidIO
+
+        tm = merge.TileMerger(
+            PyramidIO(self.work_path("alias")), merge.averaging_merger
+        )
+        a = Image.from_array(np.full((256, 256), 1.0, dtype=np.float32))
+        b = Image.from_array(np.full((256, 256), 2.0, dtype=np.float32))
+
+        first = tm._merge_by_quadrant((a, None, None, a))
+        expected = first.asarray().copy()
+        tm._merge_by_quadrant((b, b, b, b))
+        nt.assert_array_equal(first.asarray(), expected)
+
     def test_basic_cli(self):
         """Test the CLI interface. We don't go out of our way to validate the
         computations in detail -- that's for the unit tests that probe the
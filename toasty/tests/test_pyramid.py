@@ -2,6 +2,7 @@
 # Copyright 2019-2022 the AAS WorldWide Telescope project
 # Licensed under the MIT License.
 
+import os.path
 import pytest
 
 from .. import pyramid
@@ -12,6 +13,8 @@ def test_next_highest_power_of_2():
     assert pyramid.next_highest_power_of_2(1) == 256
     assert pyramid.next_highest_power_of_2(256) == 256
     assert pyramid.next_highest_power_of_2(257) == 512
+    assert pyramid.next_highest_power_of_2(512) == 512
+    assert pyramid.next_highest_power_of_2(2**40 + 1) == 2**41
 
 
 def test_depth2tiles():
@@ -19,12 +22,17 @@ def test_depth2tiles():
     assert pyramid.depth2tiles(1) == 5
     assert pyramid.depth2tiles(2) == 21
     assert pyramid.depth2tiles(10) == 1398101
+    assert pyramid.depth2tiles(40) == (4**41 - 1) // 3
 
 
 def test_is_subtile():
     from ..pyramid import is_subtile
 
     assert is_subtile(Pos(2, 0, 0), Pos(1, 0, 0)) == True
+    assert is_subtile(Pos(1, 1, 0), Pos(1, 1, 0)) == True
+    assert is_subtile(Pos(1, 1, 0), Pos(1, 0, 0)) == False
+    assert is_subtile(Pos(7, 65, 33), Pos(4, 8, 4)) == True
+    assert is_subtile(Pos(7, 65, 33), Pos(4, 8, 5)) == False
 
     with pytest.raises(ValueError):
         is_subtile(Pos(1, 0, 0), Pos(2, 0, 0))
@@ -42,6 +50,7 @@ def test_pos_parent():
 def test_generate_pos():
     from ..pyramid import generate_pos
 
+    assert list(generate_pos(-1)) == []
     assert list(generate_pos(0)) == [Pos(0, 0, 0)]
 
     assert list(generate_pos(1)) == [
@@ -52,6 +61,46 @@ def test_generate_pos():
         Pos(0, 0, 0),
     ]
 
+    def ref_postfix(pos, depth):
+        if pos.n < depth:
+            for child in pyramid.pos_children(pos):
+                yield from ref_postfix(child, depth)
+        yield pos
+
+    # Deep enough to exercise the subpyramid stitching:
+    depth = pyramid._POS_CHUNK_DEPTH + 2
+    assert list(generate_pos(depth)) == list(ref_postfix(Pos(0, 0, 0), depth))
+
+
+def test_generate_pos_many_chunks(monkeypatch):
+    from ..pyramid import generate_pos, generate_pos_arrays
+
+    # With small chunks, positions are stitched together from several levels
+    # of subpyramids, with a partial chunk at the top.
+    monkeypatch.setattr(pyramid, "_POS_CHUNK_DEPTH", 2)
+    n, x, y = generate_pos_arrays(7)
+    assert list(generate_pos(7)) == list(zip(n, x, y))
+
+
+def test_generate_pos_arrays():
+    from ..pyramid import generate_pos, generate_pos_arrays
+
+    for depth in range(4):
+        n, x, y = generate_pos_arrays(depth)
+        assert len(n) == pyramid.depth2tiles(depth)
+        assert list(zip(n, x, y)) == list(generate_pos(depth))
+
+    with pytest.raises(ValueError):
+        generate_pos_arrays(-1)
+
+    # The compiled helper sizes its own output and validates its input.
+    from .._libtoasty import postfix_pos_arrays
+
+    assert len(postfix_pos_arrays(3)[0]) == pyramid.depth2tiles(3)
+
+    with pytest.raises(ValueError):
+        postfix_pos_arrays(-1)
+
 
 def test_guess_base_layer_level():
     from ..pyramid import guess_base_layer_level
@@ -186,6 +235,19 @@ def test_pyramid_gen_toast_filtered():
     assert p.count_live_tiles() == 50
     assert p.count_operations() == 16
 
+    # Without a progress bar, these walks skip the counting pass, so make sure
+    # that they still visit everything.
+    for cli_progress in (False, True):
+        walked = []
+        p.walk(walked.append, parallel=1, cli_progress=cli_progress)
+        assert len(walked) == 16
+
+        leaves = []
+        p.visit_leaves(
+            lambda pos, tile: leaves.append(pos), parallel=1, cli_progress=cli_progress
+        )
+        assert len(leaves) == 34
+
 
 def test_pyramid_toast_filtered_gap_child():
     """
@@ -216,3 +278,250 @@ def test_pyramid_toast_filtered_gap_child():
     assert p.count_leaf_tiles() == 0
     assert p.count_live_tiles() == 0
     assert p.count_operations() == 0
+
+
+def test_pyramid_visit_leaves_parallel(tmp_path):
+    """The parallel visitor shards the pyramid across workers; it should visit
+    exactly the same leaves as the serial one, once each."""
+    from ..samplers import _latlon_tile_filter
+
+    tf = _latlon_tile_filter(0.106, 4.878, -1.285, -0.120)
+
+    def visited(p, parallel, name):
+        d = tmp_path / name
+        d.mkdir()
+
+        def callback(pos, tile):
+            assert tile.pos == pos
+            (d / f"{pos.n}_{pos.x}_{pos.y}").touch()
+
+        p.visit_leaves(callback, parallel=parallel)
+        return sorted(os.listdir(str(d)))
+
+    for i, apex in enumerate([Pos(0, 0, 0), Pos(2, 1, 3)]):
+        results = []
+
+        for parallel in (1, 2, 3):
+            p = pyramid.Pyramid.new_toast_filtered(5, tf)
+
+            if apex.n:
+                p.subpyramid(apex)
+
+            results.append(visited(p, parallel, f"{i}_{parallel}"))
+
+        assert len(results[0])
+        assert results[0] == results[1] == results[2]
+
+
+def test_pyramid_io_tile_path():
+    pio = pyramid.PyramidIO("base", default_format="png")
+    assert pio.tile_path(Pos(3, 5, 2), makedirs=False) == os.path.join(
+        "base", "3", "2", "2_5.png"
+    )
+    assert pio.tile_path(Pos(3, 5, 2), format="fits", makedirs=False) == os.path.join(
+        "base", "3", "2", "2_5.fits"
+    )
+
+    pio = pyramid.PyramidIO("", default_format="png")
+    assert pio.tile_path(Pos(3, 5, 2), makedirs=False) == os.path.join(
+        "3", "2", "2_5.png"
+    )
+
+    pio = pyramid.PyramidIO("base", scheme="LXY", default_format="png")
+    assert pio.tile_path(Pos(3, 5, 2), makedirs=False) == os.path.join(
+        "base", "L3X5Y2.png"
+    )
+
+
+@pytest.mark.parametrize("prefetch", [0, 1, 3])
+def test_pyramid_io_iter_read_images(tmp_path, prefetch):
+    import numpy as np
+    from ..image import Image, ImageMode
+
+    pio = pyramid.PyramidIO(str(tmp_path), default_format="npy")
+    positions = list(pyramid.generate_pos(2))
+
+    for i, pos in enumerate(positions):
+        if i % 2:
+            pio.write_image(pos, Image.from_array(np.full((4, 4), i, np.float32)))
+
+    results = list(
+        pio.iter_read_images(
+            iter(positions),
+            default="masked",
+            masked_mode=ImageMode.F32,
+            prefetch=prefetch,
+        )
+    )
+    assert [r[0] for r in results] == positions
+
+    for i, (_pos, img) in enumerate(results):
+        if i % 2:
+            assert img.asarray()[0, 0] == i
+        else:
+            assert img.is_completely_masked()
+
+
+def test_pyramid_io_container(tmp_path):
+    import numpy as np
+    from ..image import Image, ImageMode
+    from ..merge import averaging_merger, cascade_images
+
+    pio = pyramid.PyramidIOContainer(str(tmp_path))
+    assert pio.read_image(Pos(1, 0, 0)) is None
+
+    img = pio.read_image(Pos(1, 0, 0), default="masked", masked_mode=ImageMode.F32)
+    assert np.all(np.isnan(img.asarray()))
+
+    for i, pos in enumerate(pyramid.pos_children(Pos(0, 0, 0))):
+        pio.write_image(pos, Image.from_array(np.full((256, 256), i, np.float32)))
+
+    # Tiles should be stored and readable by a new handle.
+    pio = pyramid.PyramidIOContainer(str(tmp_path))
+    assert pio.read_image(Pos(1, 1, 0)).asarray()[0, 0] == 1
+    assert pio.read_image(Pos(0, 0, 0)) is None
+
+    cascade_images(pio, 1, averaging_merger, parallel=1)
+    assert pio.read_image(Pos(0, 0, 0)).asarray().mean() == 1.5
+
+    # Writing a fully masked tile deletes it, and rewriting it reuses its
+    # storage.
+    pio.write_image(Pos(1, 1, 0), img)
+    assert pio.read_image(Pos(1, 1, 0)) is None
+    children = pyramid.pos_children(Pos(0, 0, 0))
+    other = pyramid.PyramidIOContainer(str(tmp_path))
+    assert sum(other.read_image(p) is not None for p in children) == 3
+
+    size = os.path.getsize(tmp_path / "L1.dat")
+    pio.write_image(Pos(1, 1, 0), Image.from_array(np.full((256, 256), 7, np.float32)))
+    assert other.read_image(Pos(1, 1, 0)).asarray()[0, 0] == 7
+    assert os.path.getsize(tmp_path / "L1.dat") == size
+
+    with pytest.raises(ValueError):
+        pio.write_image(Pos(1, 0, 0), Image.from_array(np.zeros((8, 8), np.float32)))
+
+    # Float64 data can't be stored in a float32 container without loss.
+    with pytest.raises(TypeError):
+        pio.write_image(Pos(1, 0, 0), Image.from_array(np.zeros((256, 256))))
+
+    # The container remembers its data type.
+    with pytest.raises(ValueError):
+        pyramid.PyramidIOContainer(str(tmp_path), dtype=np.float64).read_image(
+            Pos(1, 0, 0)
+        )
+
+
+def test_pyramid_io_container_deep(tmp_path):
+    import numpy as np
+    from ..image import Image
+
+    # Storage is proportional to the number of tiles written, even at levels
+    # whose full tile grids would be many terabytes.
+    pio = pyramid.PyramidIOContainer(str(tmp_path))
+    positions = [Pos(13, 5000, 7000), Pos(13, 1, 8191), Pos(20, 123456, 654321)]
+
+    for i, pos in enumerate(positions):
+        pio.write_image(pos, Image.from_array(np.full((256, 256), i, np.float32)))
+
+    for i, pos in enumerate(positions):
+        assert pio.read_image(pos).asarray()[0, 0] == i
+
+    assert pio.read_image(Pos(13, 5000, 7001)) is None
+
+    tile_bytes = 256 * 256 * 4
+    total = sum(p.stat().st_size for p in tmp_path.iterdir())
+    assert total < 3 * tile_bytes + 4096
+
+    allocated = sum(p.stat().st_blocks * 512 for p in tmp_path.iterdir())
+    assert allocated < 3 * tile_bytes + 65536
+
+
+def test_pos_children_soa():
+    from ..pyramid import pos_children, pos_children_soa
+
+    ns, xs, ys = pos_children_soa(3, 5, 2)
+    assert list(zip(ns, xs, ys)) == pos_children(Pos(3, 5, 2))
+
+    ns, xs, ys = pos_children_soa([1, 2], [0, 3], [1, 2])
+    assert list(zip(ns, xs, ys)) == pos_children(Pos(1, 0, 1)) + pos_children(
+        Pos(2, 3, 2)
+    )
+
+
+@pytest.mark.parametrize("format", ["png", "npy"])
+def test_sharded_pyramid_io(tmp_path, format):
+    pytest.importorskip("zstandard")
+    import numpy as np
+    from ..image import Image
+
+    src = pyramid.PyramidIO(str(tmp_path / "src"), default_format=format)
+    written = {}
+
+    for i, (n, x, y) in enumerate(zip(*pyramid.generate_pos_arrays(2))):
+        if i % 3 == 0:
+            continue  # leave some holes
+
+        pos = Pos(int(n), int(x), int(y))
+        arr = np.full((256, 256, 3), i, dtype=np.uint8)
+        src.write_image(pos, Image.from_array(arr))
+        written[pos] = arr
+
+    pyramid.pack_sharded_pyramid(src, str(tmp_path / "dest"), 2, shard_bits=1)
+    pio = pyramid.ShardedPyramidIO(str(tmp_path / "dest"), cache_size=2)
+    assert pio.get_default_format() == format
+
+    for pos, img in pio.iter_read_images(pyramid.generate_pos(2), prefetch=4):
+        if pos in written:
+            np.testing.assert_array_equal(img.asarray(), written[pos])
+        else:
+            assert img is None
+
+    # Sharded pyramids are read-only, and attempts to modify them leave no
+    # stray files behind.
+    contents = sorted(os.listdir(tmp_path / "dest"))
+
+    with pytest.raises(PermissionError):
+        pio.write_image(Pos(0, 0, 0), img)
+    with pytest.raises(PermissionError):
+        with pio.update_image(Pos(0, 0, 0)):
+            pass
+    with pytest.raises(PermissionError):
+        pio.open_metadata_for_write("index.wtml")
+    with pytest.raises(PermissionError):
+        pio.clean_lockfiles(2)
+    with pytest.raises(PermissionError):
+        pio.tile_path(Pos(0, 0, 0))
+
+    assert sorted(os.listdir(tmp_path / "dest")) == contents
+
+
+def test_make_position_filter():
+    apex = Pos(3, 5, 2)
+    pf = pyramid._make_position_filter(apex)
+    ancestors = {apex}
+
+    while apex.n > 0:
+        apex = pyramid.pos_parent(apex)[0]
+        ancestors.add(apex)
+
+    for pos in pyramid.generate_pos(3):
+        assert pf(pos) == (pos in ancestors)
+
+    assert pf(Pos(4, 0, 0))
+
+
+@pytest.mark.parametrize("scheme", ["L/Y/YX", "LXY"])
+def test_pyramid_io_clean_lockfiles(tmp_path, scheme):
+    pio = pyramid.PyramidIO(str(tmp_path), scheme=scheme, default_format="png")
+    locks = [
+        pio.tile_path(Pos(2, 1, 3)) + ".lock",
+        pio.tile_path(Pos(2, 0, 0)) + ".lock",
+    ]
+    keep = [pio.tile_path(Pos(1, 1, 0)) + ".lock", pio.tile_path(Pos(2, 1, 3))]
+
+    for p in locks + keep:
+        open(p, "w").close()
+
+    pio.clean_lockfiles(2)
+    assert not any(os.path.exists(p) for p in locks)
+    assert all(os.path.exists(p) for p in keep)
@@ -49,3 +49,22 @@ class TestSamplers(object):
             "1",
         ]
         cli.entrypoint(args)
+
+
+@pytest.mark.skipif("not HAS_ASTRO")
+def test_frame_rotator():
+    from astropy.coordinates import BarycentricTrueEcliptic, Galactic, ICRS
+    import astropy.units as u
+
+    lon = np.linspace(0, 2 * np.pi, 37)[:, np.newaxis] * np.ones((1, 19))
+    lat = np.linspace(-0.5 * np.pi, 0.5 * np.pi, 19)[np.newaxis, :] * np.ones((37, 1))
+
+    for frame in (Galactic(), BarycentricTrueEcliptic()):
+        rlon, rlat = samplers._frame_rotator(frame)(lon, lat)
+        expected = ICRS(lon * u.rad, lat * u.rad).transform_to(frame).spherical
+        dlon = (rlon - expected.lon.rad + np.pi) % (2 * np.pi) - np.pi
+
+        # Longitudes are meaningless at the poles.
+        dlon *= np.cos(expected.lat.rad)
+        nt.assert_allclose(dlon, 0, atol=1e-12)
+        nt.assert_allclose(rlat, expected.lat.rad, atol=1e-12)
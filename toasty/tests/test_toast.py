@@ -59,6 +59,66 @@ def test_area():
         np.testing.assert_almost_equal(areas[d], 4 * np.pi)
 
 
+def test_generate_tiles_morton_order():
+    from ..pyramid import generate_pos
+
+    # Leaves come out in Morton (Z-order) order, like the generic pyramid.
+    depth = 4
+    leaves = [t.pos for t in toast.generate_tiles(depth)]
+    assert leaves == [p for p in generate_pos(depth) if p.n == depth]
+
+    codes = []
+
+    for pos in leaves:
+        code = 0
+
+        for bit in range(depth):
+            code |= ((pos.x >> bit) & 1) << (2 * bit)
+            code |= ((pos.y >> bit) & 1) << (2 * bit + 1)
+
+        codes.append(code)
+
+    assert codes == list(range(4**depth))
+
+
+def test_generate_tiles_filtered_none():
+    # A None filter is the same as a filter that accepts everything.
+    everything = [
+        t.pos for t in toast.generate_tiles_filtered(3, lambda t: True, False)
+    ]
+    assert [t.pos for t in toast.generate_tiles_filtered(3, None, False)] == everything
+    assert toast.count_tiles_matching_filter(3, None, bottom_only=False) == 84
+
+
+def test_tile_corners_read_only():
+    # Sibling tiles share the memory of their corners, so modifying one tile's
+    # corners must not be able to corrupt another's.
+    tile = next(toast.generate_tiles(2))
+
+    with pytest.raises(ValueError):
+        tile.corners[0, 0] = 0.0
+
+    tile = toast.toast_tile_for_point(3, 0.1, 0.2)
+
+    with pytest.raises(ValueError):
+        tile.corners[0, 0] = 0.0
+
+
+def test_tile_intersects_latlon_bbox():
+    from .._libtoasty import tile_intersects_latlon_bbox
+
+    # A tile straddling lon = 0 whose corners are given out of order and
+    # partially wrapped. The test must not reorder them in place.
+    corners = np.array([[6.1, 0.1], [0.2, 0.1], [0.2, 0.3], [-0.1, 0.3]])
+    orig = corners.copy()
+
+    assert tile_intersects_latlon_bbox(corners, 0.1, 0.5, 0.0, 0.2)
+    assert tile_intersects_latlon_bbox(corners, 6.0, 6.2, 0.0, 0.2)
+    assert not tile_intersects_latlon_bbox(corners, 1.0, 2.0, 0.0, 0.2)
+    assert not tile_intersects_latlon_bbox(corners, 0.1, 0.5, 0.4, 0.5)
+    np.testing.assert_array_equal(corners, orig)
+
+
 def test_tile_for_point_boundaries():
     # These test points occur at large-scale tile boundaries and so we're not
     # picky about where they land in the tiling -- either tile on a border is
@@ -116,6 +176,27 @@ def test_tile_for_point_specifics():
             assert tile.pos.y == nxy[2]
 
 
+def test_tile_for_point_edges():
+    # These points lie exactly on edges between depth-9 tiles, so which
+    # neighbor wins depends on roundoff. Like the boundaries test, we're not
+    # picky about that, but the chosen tile must actually contain the point.
+    from ..toast import toast_tile_for_point, _toast_tile_containment_score
+
+    test_data = {
+        (-45, 90): {(383, 0), (384, 0)},
+        (0, 315): {(383, 383), (384, 383)},
+        (45, 90): {(256, 127), (256, 128)},
+        (45, 270): {(256, 383), (256, 384)},
+    }
+
+    for (lat, lon), choices in test_data.items():
+        lat, lon = np.radians(lat), np.radians(lon)
+        tile = toast_tile_for_point(9, lat, lon)
+        assert tile.pos.n == 9
+        assert (tile.pos.x, tile.pos.y) in choices
+        assert _toast_tile_containment_score(tile, lat, lon) > -1e-12
+
+
 def test_pixel_for_point():
     from ..toast import toast_pixel_for_point
 
@@ -216,6 +297,68 @@ class TestSampleLayer(PyramidTester):
         sample_layer(self.pio, sampler, 1, format="png")
         self.verify_level1(ref="tess")
 
+    def test_reused_sampler_buffer(self):
+        # Tiles are written in the background, so this must work even if the
+        # sampler recycles its output array.
+        buf = np.empty((256, 256), dtype=np.float32)
+
+        def sampler(lon, lat):
+            buf[...] = lon.mean()
+            return buf
+
+        sample_layer(self.pio, sampler, 2, format="npy", parallel=1)
+
+        for tile in toast.generate_tiles(2):
+            lon, _lat = toast.toast_tile_get_coords(tile)
+            observed = self.pio.read_image(tile.pos, format="npy").asarray()
+            assert np.all(observed == np.float32(lon.mean()))
+
+    def test_background_write_errors(self):
+        # Errors in background writes must not be lost, and if the visit fails
+        # no writes may be left running.
+        from ..pyramid import Pyramid
+        from ..toast import ToastSampler
+
+        written = []
+
+        def write_image(pos, image, format=None):
+            if pos == (1, 0, 0):
+                raise OSError("write failed")
+            written.append(pos)
+
+        self.pio.write_image = write_image
+
+        def sampler(lon, lat):
+            return np.zeros(lon.shape, dtype=np.float32)
+
+        proc = ToastSampler(self.pio, sampler, True, background_writes=True)
+
+        with pytest.raises(OSError):
+            for tile in toast.generate_tiles(1):
+                proc.visit_callback(tile.pos, tile)
+            proc.flush()
+
+        assert proc._writer is None
+
+        sampled = []
+
+        def failing_sampler(lon, lat):
+            if len(sampled) == 3:
+                raise ValueError("sampling failed")
+            sampled.append(lon)
+            return np.zeros(lon.shape, dtype=np.float32)
+
+        written.clear()
+        proc = ToastSampler(self.pio, failing_sampler, True, background_writes=True)
+
+        with pytest.raises(ValueError):
+            Pyramid.new_toast(2).visit_leaves(
+                proc.visit_callback, parallel=1, flush=proc.flush
+            )
+
+        assert proc._writer is None
+        assert len(written) == len(sampled)
+
     @pytest.mark.skipif("not HAS_OPENEXR")
     def test_earth_plate_carree_exr(self):
         from ..samplers import plate_carree_sampler
@@ -38,11 +38,13 @@ toast_tile_for_point
 toast_tile_get_coords
 """.split()
 
-from collections import namedtuple
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
 from enum import Enum
 import numpy as np
+import os
 
-from ._libtoasty import subsample, mid
+from ._libtoasty import div4_corners, subsample
 from .image import Image
 from .progress import progress_bar
 from .pyramid import Pos, tiles_at_depth
@@ -98,26 +100,36 @@ class ToastCoordinateSystem(Enum):
     point lies at the middle left edge of the TOAST projection square."""
 
 
+# The corners of a tile are a 4×2 float64 array of (lon, lat) pairs, in
+# radians, ordered upper-left, upper-right, lower-right, lower-left. The tile
+# generators produce these as views into larger arrays, so they should be
+# treated as read-only.
 Tile = namedtuple("Tile", "pos corners increasing")
 
-_level1_astronomical_lonlats = np.radians(
-    [
-        [(0, -90), (90, 0), (0, 90), (180, 0)],
-        [(90, 0), (0, -90), (0, 0), (0, 90)],
-        [(180, 0), (0, 90), (270, 0), (0, -90)],
-        [(0, 90), (0, 0), (0, -90), (270, 0)],
-    ]
-)
-_level1_astronomical_lonlats.flags.writeable = False
-
 
-def _create_level1_tiles(coordsys):
-    lonlats = _level1_astronomical_lonlats
+def _make_level1_lonlats(coordsys):
+    lonlats = np.radians(
+        [
+            [(0, -90), (90, 0), (0, 90), (180, 0)],
+            [(90, 0), (0, -90), (0, 0), (0, 90)],
+            [(180, 0), (0, 90), (270, 0), (0, -90)],
+            [(0, 90), (0, 0), (0, -90), (270, 0)],
+        ]
+    )
 
     if coordsys == ToastCoordinateSystem.PLANETARY:
-        lonlats = lonlats.copy()
         lonlats[..., 0] = (lonlats[..., 0] + np.pi) % TWOPI
 
+    lonlats.flags.writeable = False
+    return lonlats
+
+
+_LEVEL1_LONLATS = {cs: _make_level1_lonlats(cs) for cs in ToastCoordinateSystem}
+
+
+def _create_level1_tiles(coordsys):
+    lonlats = _LEVEL1_LONLATS[ToastCoordinateSystem(coordsys)]
+
     return [
         Tile(Pos(n=1, x=0, y=0), lonlats[0], True),
         Tile(Pos(n=1, x=1, y=0), lonlats[1], False),
@@ -171,21 +183,50 @@ def _equ_to_xyz(lat, lon):
     )
 
 
-def _left_of_half_space_score(point_a, point_b, test_point):
+def _edge_containment_scores(corners, test_point):
     """
-    A variant of WWT Window's IsLeftOfHalfSpace.
+    Compute containment scores for tiles with the given corners.
+
+    Parameters
+    ----------
+    corners : array of shape (..., 4, 2)
+        The ``(lon, lat)`` corners of the tiles, in radians, in the usual
+        order.
+    test_point : array of shape (3,)
+        The point of interest on the unit sphere, as returned by
+        :func:`_equ_to_xyz`.
+
+    Returns
+    -------
+    An array of shape ``(...)`` of scores, as described in
+    :func:`_toast_tile_containment_score`.
+
+    Notes
+    -----
+    Each edge is scored with a variant of WWT Window's IsLeftOfHalfSpace.
 
     When determining which tile a given RA/Dec lives in, it is inevitable that
     rounding errors can make seem that certain coordinates are not contained by
     *any* tile. Unlike IsLeftOfHalf space, which returns a boolean based on the
     dot product calculated here, we return a number <= 0, where 0 indicates that
-    the test point is *definitely* in the left half-space defined by the A and B
-    points. Negative values tell us how far into the right space the point is;
-    when rounding errors are biting us, that value might be something like
-    -1e-16.
+    the test point is *definitely* in the left half-space defined by the edge.
+    Negative values tell us how far into the right space the point is; when
+    rounding errors are biting us, that value might be something like -1e-16.
 
+    All containment scores are computed here, so that different code paths
+    agree about points lying on tile edges.
     """
-    return min(np.dot(np.cross(point_a, point_b), test_point), 0)
+    xyz = _equ_to_xyz(corners[..., 1], corners[..., 0])
+
+    # The edges go ul→ur, ur→lr, lr→ll, ll→ul.
+    normals = np.cross(xyz, np.roll(xyz, -1, axis=-1), axis=0)
+    sides = np.minimum(
+        normals[0] * test_point[0]
+        + normals[1] * test_point[1]
+        + normals[2] * test_point[2],
+        0,
+    )
+    return sides[..., 0] + sides[..., 1] + sides[..., 2] + sides[..., 3]
 
 
 def _toast_tile_containment_score(tile, lat, lon):
@@ -231,17 +272,8 @@ def _toast_tile_containment_score(tile, lat, lon):
             return 0
         return -100
 
-    test_point = _equ_to_xyz(lat, lon)
-    ul = _equ_to_xyz(tile.corners[0][1], tile.corners[0][0])
-    ur = _equ_to_xyz(tile.corners[1][1], tile.corners[1][0])
-    lr = _equ_to_xyz(tile.corners[2][1], tile.corners[2][0])
-    ll = _equ_to_xyz(tile.corners[3][1], tile.corners[3][0])
-
-    upper = _left_of_half_space_score(ul, ur, test_point)
-    right = _left_of_half_space_score(ur, lr, test_point)
-    lower = _left_of_half_space_score(lr, ll, test_point)
-    left = _left_of_half_space_score(ll, ul, test_point)
-    return upper + right + lower + left
+    corners = np.asarray(tile.corners, dtype=np.float64)
+    return float(_edge_containment_scores(corners, _equ_to_xyz(lat, lon)))
 
 
 def toast_tile_for_point(depth, lat, lon, coordsys=ToastCoordinateSystem.ASTRONOMICAL):
@@ -279,28 +311,30 @@ def toast_tile_for_point(depth, lat, lon, coordsys=ToastCoordinateSystem.ASTRONO
         if _toast_tile_containment_score(tile, lat, lon) == 0.0:
             break
 
-    while tile.pos.n < depth:
+    test_point = _equ_to_xyz(lat, lon)
+    n, x, y = tile.pos
+    corners = np.asarray(tile.corners, dtype=np.float64)
+    increasing = tile.increasing
+
+    while n < depth:
         # Due to inevitable roundoff errors in the tile construction process, it
         # can arise that we find that the point is contained in a certain tile
         # but not contained in any of its children. We deal with this reality by
         # using the "containment score" rather than a binary in/out
         # classification. If no sub-tile has a containment score of zero, we
         # choose whichever tile has the least negative score. In typical
-        # roundoff situations that score will be something like -1e-16.
-        best_score = -np.inf
-
-        for child in _div4(tile):
-            score = _toast_tile_containment_score(child, lat, lon)
-
-            if score == 0.0:
-                tile = child
-                break
-
-            if score > best_score:
-                tile = child
-                best_score = score
+        # roundoff situations that score will be something like -1e-16. Scores
+        # are never positive, so the first maximal score is also the first
+        # zero score if there is one.
+        children = div4_corners(corners, increasing)
+        children.flags.writeable = False
+        best = int(np.argmax(_edge_containment_scores(children, test_point)))
+        n += 1
+        x = 2 * x + (best & 1)
+        y = 2 * y + (best >> 1)
+        corners = children[best]
 
-    return tile
+    return Tile(Pos(n, x, y), corners, increasing)
 
 
 def toast_tile_get_coords(tile):
@@ -415,59 +449,25 @@ def toast_pixel_for_point(depth, lat, lon, coordsys=ToastCoordinateSystem.ASTRON
     return tile, x0 + x, y0 + y
 
 
-def _postfix_corner(tile, depth, filter, bottom_only):
-    """
-    Yield subtiles of a given tile, in postfix (deepest-first) order.
-
-    Parameters
-    ----------
-    tile : Tile
-        Parameters of the current tile.
-    depth : int
-        The depth to descend to.
-    filter : function(Tile)->bool
-        A filter function; only tiles for which the function returns True will
-        be investigated.
-    bottom_only : bool
-        If True, only yield tiles at max_depth.
-
-    """
-    n = tile.pos.n
-    if n > depth:
-        return
-
-    if n > 1 and not filter(tile):
-        return
-
-    for child in _div4(tile):
-        for item in _postfix_corner(child, depth, filter, bottom_only):
-            yield item
-
-    if n == depth or not bottom_only:
-        yield tile
-
-
 def _div4(tile):
-    """Return the four child tiles of an input tile."""
-    n, x, y = tile.pos.n, tile.pos.x, tile.pos.y
-    ul, ur, lr, ll = tile.corners
-    increasing = tile.increasing
+    """Return the four child tiles of an input tile.
 
-    to = mid(ul, ur)
-    ri = mid(ur, lr)
-    bo = mid(lr, ll)
-    le = mid(ll, ul)
-    ce = mid(ll, ur) if increasing else mid(ul, lr)
+    The corners of the children are 4×2 views into a single array computed by
+    compiled code. The views are read-only, since they share memory."""
+    n, x, y = tile.pos
+    increasing = tile.increasing
+    corners = div4_corners(np.asarray(tile.corners, dtype=np.float64), increasing)
+    corners.flags.writeable = False
 
     n += 1
     x *= 2
     y *= 2
 
     return [
-        Tile(Pos(n=n, x=x, y=y), (ul, to, ce, le), increasing),
-        Tile(Pos(n=n, x=x + 1, y=y), (to, ur, ri, ce), increasing),
-        Tile(Pos(n=n, x=x, y=y + 1), (le, ce, bo, ll), increasing),
-        Tile(Pos(n=n, x=x + 1, y=y + 1), (ce, ri, lr, bo), increasing),
+        Tile(Pos(n, x, y), corners[0], increasing),
+        Tile(Pos(n, x + 1, y), corners[1], increasing),
+        Tile(Pos(n, x, y + 1), corners[2], increasing),
+        Tile(Pos(n, x + 1, y + 1), corners[3], increasing),
     ]
 
 
@@ -534,10 +534,15 @@ def generate_tiles(
 
     The ``n = 0`` depth is not included.
 
+    Notes
+    -----
+    The tiles at each depth are yielded in Morton (Z-order) order: each
+    parent's children are visited top left, top right, bottom left, bottom
+    right. Consecutive tiles are therefore spatially close together, which
+    helps the locality of sampling operations.
+
     """
-    return generate_tiles_filtered(
-        depth, lambda t: True, bottom_only, coordsys=coordsys
-    )
+    return generate_tiles_filtered(depth, None, bottom_only, coordsys=coordsys)
 
 
 def generate_tiles_filtered(
@@ -549,9 +554,9 @@ def generate_tiles_filtered(
     ----------
     depth : int
         The tile depth to recurse to.
-    filter : function(Tile)->bool
+    filter : function(Tile)->bool or None
         A filter function; only tiles for which the function returns True will
-        be investigated.
+        be investigated. If None, no tiles are filtered out.
     bottom_only : optional bool
         If True, then only the lowest tiles will be yielded.
     coordsys : optional :class:`ToastCoordinateSystem`
@@ -566,10 +571,34 @@ def generate_tiles_filtered(
     The ``n = 0`` depth is not included.
 
     """
-    for t in _create_level1_tiles(coordsys):
-        if filter(t):
-            for item in _postfix_corner(t, depth, filter, bottom_only):
-                yield item
+    # We traverse the tree iteratively with an explicit stack, which is much
+    # faster than recursing with nested generators. Stack entries are
+    # ``(tile, expanded)``; once a tile's children have been pushed, we push it
+    # again with ``expanded = True`` so that it is yielded after them.
+
+    stack = [(t, False) for t in reversed(_create_level1_tiles(coordsys))]
+
+    while stack:
+        tile, expanded = stack.pop()
+
+        if expanded:
+            yield tile
+            continue
+
+        n = tile.pos.n
+
+        if n > depth or (filter is not None and not filter(tile)):
+            continue
+
+        if n == depth:
+            # No need to compute the children of bottom-level tiles.
+            yield tile
+            continue
+
+        if not bottom_only:
+            stack.append((tile, True))
+
+        stack.extend((child, False) for child in reversed(_div4(tile)))
 
 
 def count_tiles_matching_filter(
@@ -653,8 +682,13 @@ def sample_layer(
     from .pyramid import Pyramid
 
     p = Pyramid.new_toast(depth, coordsys=coordsys)
-    proc = ToastSampler(pio, sampler, True, format=format)
-    p.visit_leaves(proc.visit_callback, parallel=parallel, cli_progress=cli_progress)
+    proc = ToastSampler(pio, sampler, True, format=format, background_writes=True)
+    p.visit_leaves(
+        proc.visit_callback,
+        parallel=parallel,
+        cli_progress=cli_progress,
+        flush=proc.flush,
+    )
 
 
 def sample_layer_filtered(
@@ -702,6 +736,11 @@ def sample_layer_filtered(
     p.visit_leaves(proc.visit_callback, parallel=parallel, cli_progress=cli_progress)
 
 
+# The maximum number of tiles that a ToastSampler will have waiting to be
+# written in the background.
+_MAX_PENDING_WRITES = 4
+
+
 class ToastSampler(object):
     """A utility for performing TOAST sampling on a
     :class:`~toasty.pyramid.Pyramid`.
@@ -720,6 +759,11 @@ class ToastSampler(object):
     format : optional :class:`str`
         If provided, override the default data storage format of *pio* with the
         named format, one of the values in ``toasty.image.SUPPORTED_FORMATS``.
+    background_writes : optional bool, defaults False
+        If true, and *clobber* is true, tiles will be written to disk in a
+        background thread, so that encoding one tile overlaps with sampling the
+        next one. If you use this option, you must call :meth:`flush` to ensure
+        that all of the tiles have been written.
 
     Notes
     -----
@@ -727,12 +771,19 @@ class ToastSampler(object):
     the :meth:`toasty.pyramid.Pyramid.visit_leaves` function. This class
     preserves some state between calls to help speed up processing."""
 
-    def __init__(self, pio, sampler, clobber, format=None):
+    def __init__(self, pio, sampler, clobber, format=None, background_writes=False):
         self._pio = pio
         self._sampler = sampler
         self._clobber = clobber
         self._format = format
         self._invert_into_tiles = pio.get_default_vertical_parity_sign() == 1
+        self._background_writes = background_writes
+
+        # Background writes are done with a thread pool, which can't survive a
+        # fork, so we need to keep track of which process created it.
+        self._writer = None
+        self._writer_pid = None
+        self._pending_writes = deque()
 
     def visit_callback(self, pos, tile):
         lon, lat = toast_tile_get_coords(tile)
@@ -741,6 +792,12 @@ class ToastSampler(object):
         if self._invert_into_tiles:
             sampled_data = sampled_data[::-1]
 
+        if self._clobber and self._background_writes:
+            # Samplers may reuse their output buffers, so a deferred write
+            # needs its own copy of the data.
+            self._write_in_background(pos, Image.from_array(np.array(sampled_data)))
+            return
+
         img = Image.from_array(sampled_data)
 
         if self._clobber:
@@ -752,3 +809,45 @@ class ToastSampler(object):
                 img.update_into_maskable_buffer(
                     basis, slice(None), slice(None), slice(None), slice(None)
                 )
+
+    def _write_in_background(self, pos, img):
+        # Image encoders such as PNG's zlib release the GIL, so a single writer
+        # thread lets us overlap encoding with the sampling of the next tile.
+        # We bound the number of pending writes to limit memory usage.
+        if self._writer_pid != os.getpid():
+            self._writer = ThreadPoolExecutor(max_workers=1)
+            self._writer_pid = os.getpid()
+            self._pending_writes = deque()
+
+        while len(self._pending_writes) >= _MAX_PENDING_WRITES:
+            self._pending_writes.popleft().result()
+
+        self._pending_writes.append(
+            self._writer.submit(self._pio.write_image, pos, img, format=self._format)
+        )
+
+    def flush(self):
+        """Wait for any pending background tile writes to complete.
+
+        Notes
+        -----
+        This is only needed if the sampler was created with
+        ``background_writes=True``. The background writer thread is shut down;
+        a new one will be started if more tiles are sampled. The first error
+        that occurred while writing tiles, if any, will be raised here."""
+
+        # A writer inherited through a fork has no thread in this process, so
+        # there's nothing to wait for.
+        if self._writer_pid != os.getpid():
+            return
+
+        writer, pending = self._writer, self._pending_writes
+        self._writer = None
+        self._writer_pid = None
+        self._pending_writes = deque()
+        writer.shutdown(wait=True)
+
+        for future in pending:
+            exc = future.exception()
+            if exc is not None:
+                raise exc